@@ -1,39 +1,90 @@
 
 import numpy as np
 import pandas as pd 
-from os import path, makedirs, stat
-from .. utils.tools import list_files, generate_RGB, GroupDict
-from itertools import permutations
+from os import path, makedirs, stat, cpu_count, getcwd
+from .. utils.tools import list_files, generate_RGB, GroupDict, process_map
+from ..utils.tracing import tracer, file_size
 from functools import wraps 
 from datetime import date 
-import matplotlib 
-import matplotlib.pyplot as plt
-from matplotlib.patches import Circle
-from matplotlib.collections import PatchCollection 
+import argparse
 import sys 
 
+# ### process pool workers for headless rendering ### #
+_render_network = None
+
+def _init_render_worker(network):
+    # render_plane draws on pyplot free Figures, so no backend has to be selected
+    global _render_network
+    _render_network = network
+
+def _render_worker(task):
+    return _render_network.render_plane(**task)
+
 class PoreNetwork2D:
     """
     Processing pore networks for 2D planar data
         so plane_num is an important parameter here
     """
-    def __init__(self, file_path = None, **kwargs):
+    RENDER_NAMES = {'pores': 'pore_map', 'groups': 'group_map', 'maxballs': 'ball_map'}
+
+    def __init__(self, file_path = None, plane_area = None, **kwargs):
+        """
+        plane_area: area of every plane for the porosity; None estimates it from the maxballs
+        """
+        self.plane_area = plane_area
         self.connection_groups = {}
+        self.spatial_indices = {}
         self.max_balls = []
-        self.pores = [pd.read_csv(path.join(file_path, file_name), header=0, sep=',') for file_name in list_files(file_path, 'pores')]
+        with tracer.span('pore_network.load_pores') as span:
+            pore_files = list_files(file_path, 'pores')
+            self.pores = [pd.read_csv(path.join(file_path, file_name), header=0, sep=',') for file_name in pore_files]
+            if tracer.enabled:
+                span.add(items = sum(len(pores) for pores in self.pores),
+                            bytes_read = sum(file_size(path.join(file_path, file_name)) for file_name in pore_files))
         if len(self.pores) == 0:
             print('no pore file found, exit!')
             sys.exit(-1)
-        self.connections = [np.loadtxt(path.join(file_path, file_name)) for file_name in list_files(file_path, 'connections') if stat(path.join(file_path, file_name)).st_size != 0]
-        if len(self.connections) == 0:
+        with tracer.span('pore_network.load_connections') as span:
+            connection_files = list_files(file_path, 'connections')
+            # an empty file is a plane without pores; keep it so connections[i] matches pores[i]
+            self.connections = [np.loadtxt(path.join(file_path, file_name), ndmin = 2) if stat(path.join(file_path, file_name)).st_size != 0
+                                    else np.zeros((0, 0)) for file_name in connection_files]
+            if tracer.enabled:
+                span.add(items = len(self.connections),
+                            bytes_read = sum(file_size(path.join(file_path, file_name)) for file_name in connection_files))
+        if not any(connections.size for connections in self.connections):
             print('connection files are empty; exit')
             sys.exit(-1)
-        self.max_balls.extend([pd.read_csv(path.join(file_path, file_), header=0, sep=',') for file_ in list_files(file_path, 'maxball')])
+        with tracer.span('pore_network.load_maxballs') as span:
+            maxball_files = list_files(file_path, 'maxball')
+            self.max_balls.extend([pd.read_csv(path.join(file_path, file_), header=0, sep=',') for file_ in maxball_files])
+            if tracer.enabled:
+                span.add(items = sum(len(max_balls) for max_balls in self.max_balls),
+                            bytes_read = sum(file_size(path.join(file_path, file_)) for file_ in maxball_files))
         print('the length of max balls is = ', len(self.max_balls))
 
         self.save_dir = path.join(file_path, 'Post_Processed_Data' + date.today().strftime('%b-%d-%Y'))
         if not path.isdir(self.save_dir):
-            self.save_dir = makedirs(self.save_dir)
+            makedirs(self.save_dir)
+
+    @classmethod
+    def from_arrays(cls, pores, connections, max_balls, file_path = None, plane_area = None):
+        """
+        builds a network from in memory frames, e.g. the outputs of PoreExtractor,
+            without reading pores*, maxball* and connections* files
+        file_path: directory of the network (default: working directory); as in
+            __init__ outputs go to its Post_Processed_Data<date> subdirectory
+        plane_area: area of every plane, used by statistics for the porosity
+        """
+        network = cls.__new__(cls)
+        network.connection_groups = {}
+        network.spatial_indices = {}
+        network.pores = list(pores)
+        network.connections = list(connections)
+        network.max_balls = list(max_balls)
+        network.plane_area = plane_area
+        network.save_dir = path.join(file_path or getcwd(), 'Post_Processed_Data' + date.today().strftime('%b-%d-%Y'))
+        return network
     
     @property
     def is_connection_group(self):
@@ -42,20 +93,107 @@ class PoreNetwork2D:
         else:
             return False 
     
-    def _generate_connection_groups(self, plane_num):
+    # ### lazily built spatial indices per plane ### #
+    def spatial_index(self, plane_num = 0, of = 'pores'):
+        """
+        of: pores or maxballs
+        the index is built on first use and cached on the instance
+        """
+        from .spatial import PlaneIndex
+        key = (of, plane_num)
+        if key not in self.spatial_indices:
+            frame = {'pores': self.pores, 'maxballs': self.max_balls}[of][plane_num]
+            self.spatial_indices[key] = PlaneIndex.from_frame(frame)
+        return self.spatial_indices[key]
+
+    def clear_spatial_indices(self):
+        self.spatial_indices = {}
+
+    def pores_in_region(self, plane_num, lower, upper):
+        return self.spatial_index(plane_num, 'pores').query_range(lower, upper)
+
+    def nearest_maxballs(self, plane_num = 0, k = 1):
+        """
+        k nearest maximal balls to every pore of the plane
+        returns (distances, maxball rows) with one row per pore
+        """
+        pores = self.spatial_index(plane_num, 'pores')
+        return self.spatial_index(plane_num, 'maxballs').query_nearest(pores.centers, k = k)
+
+    def overlapping_pores(self, plane_num = 0):
+        return self.spatial_index(plane_num, 'pores').overlapping_pairs()
+
+    def stitch_pores(self, planes = None, tolerance = 0.0):
+        """
+        links overlapping pores of adjacent planes into 3D chains
+        returns a list of (length, 2) arrays of (plane number, pore row)
+        """
+        if planes is None:
+            planes = range(len(self.pores))
+        planes = list(planes)
+        chains, open_chains = [], {}
+        for plane_num in planes[:1]:
+            open_chains = {row: [(plane_num, row)] for row in range(len(self.pores[plane_num]))}
+        for prev_plane, plane_num in zip(planes[:-1], planes[1:]):
+            links = self.spatial_index(prev_plane, 'pores').match(self.spatial_index(plane_num, 'pores'), tolerance = tolerance)
+            next_chains = {}
+            for prev_row, row in links:
+                next_chains[row] = open_chains.pop(prev_row) + [(plane_num, row)]
+            chains.extend(open_chains.values())
+            for row in range(len(self.pores[plane_num])):
+                if row not in next_chains:
+                    next_chains[row] = [(plane_num, row)]
+            open_chains = next_chains
+        chains.extend(open_chains.values())
+        return [np.asarray(chain, dtype = np.intp) for chain in chains]
+
+    @staticmethod
+    def _to_group_dict(groups):
         connection_group = GroupDict()
-        for count, ind in enumerate(permutations(range(self.connections[plane_num].shape[0]), 2)):
-            if self.connections[plane_num][ind] == 1:
-                connection_group[count] = set(ind)
-        self.connection_groups[plane_num] = connection_group 
+        dict.update(connection_group, {count: set(group.tolist()) for count, group in enumerate(groups)})
+        return connection_group
+
+    def _generate_connection_groups(self, plane_num):
+        from .statistics import connected_groups
+        self.connection_groups[plane_num] = PoreNetwork2D._to_group_dict(connected_groups(self.connections[plane_num]))
+
+    def generate_connection_groups(self, planes = None, workers = None):
+        """
+        groups the planes that are not grouped yet using a process pool
+            workers: processes as in process_map
+        """
+        from .statistics import connected_groups
+        if planes is None:
+            planes = range(len(self.connections))
+        planes = [plane_num for plane_num in planes if plane_num not in self.connection_groups]
+        workers = 1 if len(planes) < 2 else workers
+        groups = process_map(connected_groups, [self.connections[plane_num] for plane_num in planes], workers = workers,
+                                chunksize = max(1, len(planes)//(8*(workers or cpu_count()))))
+        self.connection_groups.update({plane_num: PoreNetwork2D._to_group_dict(group) for plane_num, group in zip(planes, groups)})
+
+    # ### statistics over all planes ### #
+    def statistics(self, plane_area = None, workers = None):
+        """
+        table indexed by plane with pore size, porosity, coordination and group statistics
+            see NetworkStatistics for the distributions
+        """
+        from .statistics import NetworkStatistics
+        return NetworkStatistics(self, plane_area = plane_area).summary(workers = workers)
         
-    def plot_pore_groups(self, plane_num = 0, figure = None, alpha = 0.5, maxballs = True):
+    def plot_pore_groups(self, plane_num = 0, figure = None, alpha = 0.5, maxballs = True, seed = None):
+        """
+        seed: color seed passed to generate_RGB; None keeps the global numpy state
+        """
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Circle
+        from matplotlib.collections import PatchCollection
+        rng = None if seed is None else np.random.RandomState(seed)
 
-        if self.is_connection_group or plane_num not in self.connection_groups.keys():
+        if plane_num not in self.connection_groups.keys():
             self._generate_connection_groups(plane_num)
         
-        group_colors = generate_RGB(len(self.connection_groups[plane_num].keys()))
-        edge_group_colors = generate_RGB(len(self.connection_groups[plane_num].keys())) 
+        group_colors = generate_RGB(len(self.connection_groups[plane_num].keys()), seed = rng)
+        edge_group_colors = generate_RGB(len(self.connection_groups[plane_num].keys()), seed = rng) 
         connected_patches = [PatchCollection([Circle((self.pores[plane_num].loc[pore, 'x'], self.pores[plane_num].loc[pore, 'y']), radius = self.pores[plane_num].loc[pore, 'radius']) for pore in group], facecolor=group_colors[count], edgecolor=edge_group_colors[count], alpha = alpha, linewidth = 3) for count, group in \
             enumerate(self.connection_groups[plane_num])]
         
@@ -65,8 +203,8 @@ class PoreNetwork2D:
         connected_ids = set(connected_ids)
 
         unconnected_ids = [_id for _id in self.pores[plane_num]['id'].tolist() if _id not in connected_ids]
-        group_colors = generate_RGB(len(unconnected_ids))
-        edge_group_colors = generate_RGB(len(unconnected_ids))
+        group_colors = generate_RGB(len(unconnected_ids), seed = rng)
+        edge_group_colors = generate_RGB(len(unconnected_ids), seed = rng)
         unconnected_patches = [PatchCollection([Circle((self.pores[plane_num].loc[pore, 'x'], self.pores[plane_num].loc[pore, 'y']), radius = self.pores[plane_num].loc[pore, 'radius'])],
                         facecolor = group_colors[count], edgecolor = edge_group_colors[count], alpha = alpha, linewidth = 3) for count, pore in enumerate(unconnected_ids)]
         
@@ -75,8 +213,7 @@ class PoreNetwork2D:
         else:
             fig, axs = figure
         
-        axs.set_xlim(self.pores[plane_num]['x'].min(), self.pores[plane_num]['x'].max())
-        axs.set_ylim(self.pores[plane_num]['y'].min(), self.pores[plane_num]['y'].max())
+        PoreNetwork2D._set_limits(axs, self.pores[plane_num])
         axs.set_xlabel('x')
         axs.set_ylabel('y')
         
@@ -90,9 +227,22 @@ class PoreNetwork2D:
 
         return fig, axs
 
+    @staticmethod
+    def _set_limits(axs, frame):
+        """
+        axis limits from the extent of the circles in frame; planes without pores keep the default limits
+        """
+        if frame.empty:
+            return
+        axs.set_xlim((frame['x'] - frame['radius']).min(), (frame['x'] + frame['radius']).max())
+        axs.set_ylim((frame['y'] - frame['radius']).min(), (frame['y'] + frame['radius']).max())
+
     # ### Plot pores without connection based grouping ### #
     def plot_pores(self, plane_num = 0, figure = None, alpha = 0.3, maxballs = False):
-        
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Circle
+        from matplotlib.collections import PatchCollection
+
         return_fig = True
         if figure is None:
             fig, axs = plt.subplots(figsize=(6,6))
@@ -106,8 +256,7 @@ class PoreNetwork2D:
                   alpha = alpha, linewidth = 3)
         
         
-        axs.set_xlim(self.pores[plane_num]['x'].min(), self.pores[plane_num]['x'].max())
-        axs.set_ylim(self.pores[plane_num]['y'].min(), self.pores[plane_num]['y'].max())
+        PoreNetwork2D._set_limits(axs, self.pores[plane_num])
         axs.set_xlabel('x')
         axs.set_ylabel('y')       
 
@@ -123,6 +272,7 @@ class PoreNetwork2D:
         screen_by: radius or rank:
         input format: <key>_<value>
         """
+        import matplotlib.pyplot as plt
         return_fig = True
         if figure is None:
             fig, axs = plt.subplots(figsize = (6,6))
@@ -139,10 +289,76 @@ class PoreNetwork2D:
                 
         cm = axs.scatter(maxballs['x'], maxballs['y'],
                         c = maxballs[colorby], s = markersize, cmap = 'jet')
-        axs.set_xlim(maxballs['x'].min(), maxballs['x'].max())
-        axs.set_ylim(maxballs['y'].min(), maxballs['y'].max())
-        cm.set_clim(maxballs[colorby].min(), maxballs[colorby].max())
-        plt.colorbar(cm)
+        PoreNetwork2D._set_limits(axs, maxballs)
+        if not maxballs.empty:
+            cm.set_clim(maxballs[colorby].min(), maxballs[colorby].max())
+        fig.colorbar(cm, ax = axs)
 
         if return_fig:
-            return fig, axs 
+            return fig, axs
+
+    # ### headless rendering of planes to files ### #
+    def render_plane(self, plane_num = 0, kinds = ('pores', 'groups', 'maxballs'), formats = ('png',),
+                        save_dir = None, seed = 0, dpi = 150):
+        """
+        renders one plane without pyplot; one file per kind and format
+            is written to save_dir as plane_<plane_num>_<pore/group/ball>_map.<format>;
+            the names never contain pores, maxball or connections, so renders
+            in a network directory are not read back as network files
+        seed: base color seed; the plane number is added so colors do not
+            depend on the process that renders the plane
+        """
+        from matplotlib.figure import Figure
+        if save_dir is None:
+            save_dir = self.save_dir
+        out_files = []
+        for kind in kinds:
+            fig = Figure(figsize = (6,6))
+            axs = fig.add_subplot(111)
+            if kind == 'groups':
+                self.plot_pore_groups(plane_num, figure = (fig, axs),
+                        seed = None if seed is None else seed + plane_num)
+            else:
+                {'pores': self.plot_pores, 'maxballs': self.plot_maxballs}[kind](plane_num, figure = (fig, axs))
+            for fmt in formats:
+                out_name = path.join(save_dir, 'plane_' + str(plane_num) + '_' + PoreNetwork2D.RENDER_NAMES[kind] + '.' + fmt)
+                fig.savefig(out_name, format = fmt, dpi = dpi)
+                out_files.append(out_name)
+        return out_files
+
+    def render_planes(self, planes = None, kinds = ('pores', 'groups', 'maxballs'), formats = ('png',),
+                        save_dir = None, seed = 0, dpi = 150, workers = None):
+        """
+        batch export of all (or selected) planes using a process pool
+            planes: iterable of plane numbers; None renders all planes
+            workers: processes as in process_map
+        """
+        if planes is None:
+            planes = range(len(self.pores))
+        if save_dir is None:
+            save_dir = self.save_dir
+        if not path.isdir(save_dir):
+            makedirs(save_dir)
+        tasks = [{'plane_num': plane_num, 'kinds': tuple(kinds), 'formats': tuple(formats),
+                    'save_dir': save_dir, 'seed': seed, 'dpi': dpi} for plane_num in planes]
+
+        out_files = list(process_map(_render_worker, tasks, workers = workers, initializer = _init_render_worker, initargs = (self,)))
+        # workers = 1 initialized this process; do not keep the network alive
+        _init_render_worker(None)
+        return [out_name for plane_files in out_files for out_name in plane_files]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'render pores, groups and maxballs of all planes')
+    parser.add_argument('-file_path', nargs = '?', type=str, required = True, help='path to pores, maxball and connections files')
+    parser.add_argument('--planes', nargs = '*', type=int, default = None, help='plane numbers to render; default is all planes')
+    parser.add_argument('--kinds', nargs = '+', type=str, default = ['pores', 'groups', 'maxballs'], help='pores/groups/maxballs')
+    parser.add_argument('--formats', nargs = '+', type=str, default = ['png'], help='png/svg')
+    parser.add_argument('--save_dir', nargs = '?', type=str, default = None, help='output directory')
+    parser.add_argument('--seed', nargs = '?', type=int, default = 0, help='color seed')
+    parser.add_argument('--workers', nargs = '?', type=int, default = None, help='number of processes')
+    args = parser.parse_args()
+
+    network = PoreNetwork2D(file_path = args.file_path)
+    network.render_planes(planes = args.planes, kinds = args.kinds, formats = args.formats,
+                            save_dir = args.save_dir, seed = args.seed, workers = args.workers) 
@@ -0,0 +1,200 @@
+# ######################################## #
+#   Maximal ball and pore extraction       #
+# ######################################## #
+
+import numpy as np
+import pandas as pd
+from os import path, makedirs
+from scipy import ndimage
+from scipy.spatial import cKDTree
+from .. utils.tools import process_map
+
+# neighbour offsets in the plane
+_NEIGHBOURS = [(di, dj) for di in (-1, 0, 1) for dj in (-1, 0, 1) if (di, dj) != (0, 0)]
+
+def _shifted(array, di, dj, fill):
+    """
+    out[i, j] = array[i + di, j + dj]; out of bound values are fill
+    """
+    out = np.full_like(array, fill)
+    ni, nj = array.shape
+    out[max(0, -di):ni - max(0, di), max(0, -dj):nj - max(0, dj)] = array[max(0, di):ni + min(0, di), max(0, dj):nj + min(0, dj)]
+    return out
+
+def _extract_slab(task):
+    slab, void, min_radius, tolerance, voxel_size = task
+    return [PoreExtractor.extract_plane(plane, void = void, min_radius = min_radius, tolerance = tolerance,
+                voxel_size = voxel_size) for plane in slab]
+
+class PoreExtractor:
+    """
+    extracts maximal balls, pores and connections directly from a binary voxel domain
+        the domain is cut into planes along direction and every plane is processed
+        with a 2D Euclidean distance transform; planes are independent so the
+        volume is handled in slabs of chunk planes spread over a process pool
+    => the outputs have the layout PoreNetwork2D reads from
+        pores*, maxball* and connections* files
+    """
+    def __init__(self, domain, void = 0, direction = 'z', chunk = 16, min_radius = 1.0, tolerance = 0.5, voxel_size = 1):
+        self.domain = domain
+        self.void = void
+        self.axis = {'x': 0, 'y': 1, 'z': 2}[direction]
+        self.direction = direction
+        self.chunk = chunk
+        self.min_radius = min_radius
+        self.tolerance = tolerance
+        self.voxel_size = voxel_size
+        self.pores, self.max_balls, self.connections, self.throats = [], [], [], []
+
+    @classmethod
+    def from_pack_slicer(cls, slicer, direction = 'z', **kwargs):
+        """
+        uses the trimmed domain if trim_data was called; solid voxels are 1 in packs
+        """
+        return cls(getattr(slicer, 'domain', slicer.all_data), void = 0, direction = direction, **kwargs)
+
+    @classmethod
+    def from_image_reader(cls, reader, void = 0, direction = 'z', **kwargs):
+        return cls(reader.stack_array, void = void, direction = direction, **kwargs)
+
+    @property
+    def num_planes(self):
+        return self.domain.shape[self.axis]
+
+    def _slabs(self, planes):
+        for begin in range(0, len(planes), self.chunk):
+            index = planes[begin:begin + self.chunk]
+            slab = np.moveaxis(np.asarray(np.take(self.domain, index, axis = self.axis)), self.axis, 0)
+            yield slab, self.void, self.min_radius, self.tolerance, self.voxel_size
+
+    # ### per plane extraction ### #
+    @staticmethod
+    def maximal_balls(dist, tolerance = 0.5):
+        """
+        a void pixel is the center of a maximal ball if its ball is not
+            contained in the ball of any of its 8 neighbours
+        tolerance: in pixels; discrete distances are approximate so balls within
+            tolerance of a neighbour's ball count as contained
+        """
+        maximal = dist > 0
+        for di, dj in _NEIGHBOURS:
+            maximal &= _shifted(dist, di, dj, 0) < dist + np.hypot(di, dj) - tolerance
+        return maximal
+
+    @staticmethod
+    def _pore_seeds(dist, min_radius):
+        peaks = (dist == ndimage.maximum_filter(dist, size = 3, mode = 'constant')) & (dist >= min_radius)
+        labels, num = ndimage.label(peaks, structure = np.ones((3, 3)))
+        if num == 0:
+            return np.empty((0, 2), dtype = int), np.empty(0)
+        seeds = np.array(ndimage.maximum_position(dist, labels, np.arange(1, num + 1)), dtype = int).reshape(-1, 2)
+        radius = dist[seeds[:,0], seeds[:,1]]
+        # a seed inside the ball of a larger seed belongs to the same pore
+        order = np.argsort(-radius, kind = 'stable')
+        seeds, radius = seeds[order], radius[order]
+        tree = cKDTree(seeds)
+        keep = np.ones(len(seeds), dtype = bool)
+        for count in range(len(seeds)):
+            if keep[count]:
+                inside = np.asarray(tree.query_ball_point(seeds[count], radius[count]), dtype = int)
+                keep[inside[inside > count]] = False
+        return seeds[keep], radius[keep]
+
+    @staticmethod
+    def _assign_pores(void_mask, seeds):
+        """
+        pore label (1 based) of every void pixel: the nearest seed of its own void
+            component, so labels never cross solid; components without a seed stay 0
+        """
+        components, _ = ndimage.label(void_mask, structure = np.ones((3, 3)))
+        markers = np.zeros(void_mask.shape, dtype = int)
+        markers[seeds[:,0], seeds[:,1]] = np.arange(1, len(seeds) + 1)
+        labels = np.zeros(void_mask.shape, dtype = int)
+        boxes = ndimage.find_objects(components)
+        for component in np.unique(components[seeds[:,0], seeds[:,1]]):
+            box = boxes[component - 1]
+            inside = components[box] == component
+            box_markers = np.where(inside, markers[box], 0)
+            nearest = ndimage.distance_transform_edt(box_markers == 0, return_distances = False, return_indices = True)
+            labels[box] = np.where(inside, box_markers[nearest[0], nearest[1]], labels[box])
+        return labels
+
+    @staticmethod
+    def extract_plane(plane, void = 0, min_radius = 1.0, tolerance = 0.5, voxel_size = 1):
+        """
+        returns (pores, max_balls, connections, throats) of one 2D plane
+            pores: frame of id, x, y, radius
+            max_balls: frame of x, y, radius
+            connections: square 0/1 matrix between pores
+            throats: frame of pore1, pore2 and the radius of the largest ball on their interface
+        """
+        void_mask = np.asarray(plane) == void
+        dist = ndimage.distance_transform_edt(void_mask)
+
+        maximal = PoreExtractor.maximal_balls(dist, tolerance = tolerance)
+        mx, my = np.nonzero(maximal)
+        max_balls = pd.DataFrame({'x': mx*voxel_size, 'y': my*voxel_size, 'radius': dist[mx, my]*voxel_size})
+
+        seeds, radius = PoreExtractor._pore_seeds(dist, min_radius)
+        num_pores = len(seeds)
+        pores = pd.DataFrame({'id': np.arange(num_pores), 'x': seeds[:,0]*voxel_size,
+                                'y': seeds[:,1]*voxel_size, 'radius': radius*voxel_size})
+        connections = np.zeros((num_pores, num_pores), dtype = int)
+        if num_pores < 2:
+            return pores, max_balls, connections, pd.DataFrame(columns = ['pore1', 'pore2', 'radius'])
+
+        labels = PoreExtractor._assign_pores(void_mask, seeds)
+
+        # adjacent void pixels of different pores form a throat
+        pairs, widths = [], []
+        for di, dj in [(0, 1), (1, 0)]:
+            other = _shifted(labels, di, dj, 0)
+            face = (labels > 0) & (other > 0) & (labels != other)
+            pairs.append(np.column_stack((labels[face], other[face])) - 1)
+            widths.append(np.minimum(dist[face], _shifted(dist, di, dj, 0)[face]))
+        pairs, widths = np.sort(np.concatenate(pairs), axis = 1), np.concatenate(widths)
+        throats = pd.DataFrame({'pore1': pairs[:,0], 'pore2': pairs[:,1], 'radius': widths*voxel_size})
+        throats = throats.groupby(['pore1', 'pore2'], as_index = False)['radius'].max()
+        connections[throats['pore1'].values, throats['pore2'].values] = 1
+        connections[throats['pore2'].values, throats['pore1'].values] = 1
+        return pores, max_balls, connections, throats
+
+    def __call__(self, planes = None, workers = None):
+        """
+        planes: plane numbers along direction; None extracts all planes
+        workers: processes as in process_map
+        """
+        planes = list(range(self.num_planes)) if planes is None else list(planes)
+        self._collect(process_map(_extract_slab, self._slabs(planes), workers = workers))
+        return self
+
+    def _collect(self, results):
+        self.pores, self.max_balls, self.connections, self.throats = [], [], [], []
+        for slab in results:
+            for pores, max_balls, connections, throats in slab:
+                self.pores.append(pores)
+                self.max_balls.append(max_balls)
+                self.connections.append(connections)
+                self.throats.append(throats)
+
+    def to_network(self, file_path = None):
+        """
+        file_path: directory the network belongs to, e.g. the directory of to_files
+        """
+        from .classification import PoreNetwork2D
+        plane_area = None
+        if self.domain is not None:
+            plane_area = float(np.prod([n for axis, n in enumerate(self.domain.shape) if axis != self.axis]))*self.voxel_size**2
+        return PoreNetwork2D.from_arrays(self.pores, self.connections, self.max_balls, file_path = file_path,
+                                            plane_area = plane_area)
+
+    def to_files(self, save_dir):
+        """
+        writes the pores*, maxball* and connections* files PoreNetwork2D reads
+        """
+        if not path.isdir(save_dir):
+            makedirs(save_dir)
+        for count, (pores, max_balls, connections) in enumerate(zip(self.pores, self.max_balls, self.connections)):
+            pores.to_csv(path.join(save_dir, 'pores_' + str(count) + '.csv'), sep = ',', header = True, index = False)
+            max_balls.to_csv(path.join(save_dir, 'maxball_' + str(count) + '.csv'), sep = ',', header = True, index = False)
+            np.savetxt(path.join(save_dir, 'connections_' + str(count) + '.txt'), connections, fmt = '%d')
@@ -0,0 +1,103 @@
+# ############################### #
+#   Spatial index for 2D planes   #
+# ############################### #
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+class PlaneIndex:
+    """
+    KD-tree over the circles (pores or maximal balls) of one plane
+        all queries are batched and return row positions into the
+        frame the index was built from
+    """
+    def __init__(self, x, y, radius = None):
+        self.centers = np.column_stack((np.asarray(x, dtype = float), np.asarray(y, dtype = float)))
+        if radius is None:
+            self.radius = np.zeros(self.centers.shape[0])
+        else:
+            self.radius = np.asarray(radius, dtype = float)
+        self.max_radius = self.radius.max() if self.radius.size > 0 else 0.0
+        self.tree = cKDTree(self.centers)
+
+    @classmethod
+    def from_frame(cls, frame):
+        return cls(frame['x'].values, frame['y'].values, frame['radius'].values if 'radius' in frame.columns else None)
+
+    def __len__(self):
+        return self.centers.shape[0]
+
+    def query_range(self, lower, upper):
+        """
+        lower, upper: (n, 2) corners of n axis aligned boxes
+        returns a list of n index arrays of the centers inside each box
+        """
+        lower, upper = np.atleast_2d(lower).astype(float), np.atleast_2d(upper).astype(float)
+        mid = 0.5*(lower + upper)
+        half = 0.5*(upper - lower).max(axis = 1)
+        hits = self.tree.query_ball_point(mid, half, p = np.inf)
+        out = []
+        for count, hit in enumerate(hits):
+            hit = np.asarray(hit, dtype = np.intp)
+            inside = np.all((self.centers[hit] >= lower[count]) & (self.centers[hit] <= upper[count]), axis = 1)
+            out.append(np.sort(hit[inside]))
+        return out
+
+    def query_nearest(self, points, k = 1):
+        """
+        points: (n, 2) query points
+        returns (distances, indices) of shape (n, k); missing neighbours
+            have an infinite distance and index len(self)
+        """
+        dist, ind = self.tree.query(np.atleast_2d(points), k = k)
+        return dist.reshape(-1, k), ind.reshape(-1, k)
+
+    def query_overlap(self, points, radius):
+        """
+        circles overlapping each of the n query circles (points, radius)
+        returns a list of n index arrays
+        """
+        points = np.atleast_2d(points).astype(float)
+        radius = np.broadcast_to(np.asarray(radius, dtype = float), (points.shape[0],))
+        hits = self.tree.query_ball_point(points, radius + self.max_radius)
+        out = []
+        for count, hit in enumerate(hits):
+            hit = np.asarray(hit, dtype = np.intp)
+            dist = np.hypot(*(self.centers[hit] - points[count]).T)
+            out.append(np.sort(hit[dist < self.radius[hit] + radius[count]]))
+        return out
+
+    def overlapping_pairs(self):
+        """
+        (m, 2) array of index pairs i < j of overlapping circles within the plane
+        """
+        pairs = self.tree.query_pairs(2*self.max_radius, output_type = 'ndarray')
+        if pairs.shape[0] == 0:
+            return pairs.reshape(0, 2)
+        dist = np.hypot(*(self.centers[pairs[:,0]] - self.centers[pairs[:,1]]).T)
+        pairs = pairs[dist < self.radius[pairs[:,0]] + self.radius[pairs[:,1]]]
+        return pairs[np.lexsort((pairs[:,1], pairs[:,0]))]
+
+    def match(self, other, tolerance = 0.0):
+        """
+        one to one links between the circles of this plane and of another plane
+            every overlapping pair is a candidate; pairs are taken closest first
+            and a circle already linked is skipped, so each circle of other is
+            linked to the nearest overlapping circle of self that is still free
+        returns (m, 2) array of (self index, other index)
+        """
+        if len(self) == 0 or len(other) == 0:
+            return np.empty((0, 2), dtype = np.intp)
+        hits = self.query_overlap(other.centers, other.radius + tolerance)
+        ind = np.concatenate(hits).astype(np.intp)
+        other_ind = np.repeat(np.arange(len(other)), [len(hit) for hit in hits])
+        dist = np.hypot(*(self.centers[ind] - other.centers[other_ind]).T)
+        order = np.lexsort((ind, other_ind, dist))
+        links, linked_self, linked_other = [], set(), set()
+        for row, other_row in zip(ind[order], other_ind[order]):
+            if row not in linked_self and other_row not in linked_other:
+                links.append((row, other_row))
+                linked_self.add(row)
+                linked_other.add(other_row)
+        links = np.array(links, dtype = np.intp).reshape(-1, 2)
+        return links[np.argsort(links[:,0])]
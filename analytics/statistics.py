@@ -0,0 +1,138 @@
+# ################################## #
+#   Vectorized pore network metrics  #
+# ################################## #
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+def connected_groups(connections):
+    """
+    groups of connected pores from a square connection matrix
+        pores without any connection are not part of a group
+    returns a list of pore index arrays
+    """
+    connections = np.asarray(connections)
+    if connections.ndim != 2 or connections.size == 0:
+        return []
+    # a pore connected only to itself is not a group
+    linked = (connections == 1) & ~np.eye(*connections.shape, dtype = bool)
+    _, labels = connected_components(csr_matrix(linked), directed = False)
+    connected = np.flatnonzero(linked.any(axis = 0) | linked.any(axis = 1))
+    order = connected[np.argsort(labels[connected], kind = 'stable')]
+    _, starts = np.unique(labels[order], return_index = True)
+    return np.split(order, starts[1:]) if order.size > 0 else []
+
+class NetworkStatistics:
+    """
+    per plane statistics of a PoreNetwork2D computed in one pass over
+        the concatenated pore, maxball and connection data
+    """
+    def __init__(self, network, plane_area = None):
+        """
+        plane_area: area of every plane used for the porosity; None uses the
+            plane_area of the network (known for extracted networks) or else
+            estimates it from the extent of the maximal balls
+        """
+        self.network = network
+        self.plane_area = plane_area if plane_area is not None else getattr(network, 'plane_area', None)
+        self.num_planes = len(network.pores)
+        self.pores = self._concat(network.pores)
+        self.max_balls = self._concat(network.max_balls)
+
+    @staticmethod
+    def _concat(frames):
+        if len(frames) == 0:
+            return pd.DataFrame(columns = ['plane', 'x', 'y', 'radius'])
+        # frames read from empty files have object columns
+        frame = pd.concat([frame[['x', 'y', 'radius']].astype(float) for frame in frames], ignore_index = True)
+        frame.insert(0, 'plane', np.repeat(np.arange(len(frames)), [len(frame) for frame in frames]))
+        return frame
+
+    def _planes(self):
+        return pd.RangeIndex(self.num_planes, name = 'plane')
+
+    def _estimate_area(self):
+        frame = self.max_balls if not self.max_balls.empty else self.pores
+        bounds = pd.DataFrame({'x_min': frame['x'] - frame['radius'], 'x_max': frame['x'] + frame['radius'],
+                                'y_min': frame['y'] - frame['radius'], 'y_max': frame['y'] + frame['radius'],
+                                'plane': frame['plane']}).groupby('plane').agg({'x_min': 'min', 'x_max': 'max', 'y_min': 'min', 'y_max': 'max'})
+        return ((bounds['x_max'] - bounds['x_min'])*(bounds['y_max'] - bounds['y_min'])).reindex(self._planes())
+
+    def pore_sizes(self):
+        stats = self.pores.groupby('plane')['radius'].agg(['count', 'mean', 'std', 'min', 'median', 'max'])
+        stats.columns = ['num_pores'] + ['radius_' + col for col in stats.columns[1:]]
+        stats = stats.reindex(self._planes())
+        stats['num_pores'] = stats['num_pores'].fillna(0).astype(int)
+        return stats
+
+    def porosity(self):
+        """
+        estimate: summed pore disk areas (overlaps count twice) over the plane area;
+            planes without pores have porosity 0
+        """
+        area = np.pi*self.pores['radius'].values**2
+        pore_area = pd.Series(np.bincount(self.pores['plane'].values, weights = area, minlength = self.num_planes), index = self._planes())
+        plane_area = self._estimate_area() if self.plane_area is None else self.plane_area
+        porosity = (pore_area/plane_area).where(pore_area > 0, 0.0)
+        return pd.DataFrame({'pore_area': pore_area, 'porosity': porosity})
+
+    def coordination(self):
+        """
+        coordination number of every pore, concatenated over all planes
+        """
+        connections = self.network.connections[:self.num_planes]
+        degree = np.concatenate([((np.atleast_2d(conn) == 1) & ~np.eye(*np.atleast_2d(conn).shape, dtype = bool)).sum(axis = 1)
+                                    for conn in connections]) if connections else np.empty(0)
+        plane = np.repeat(np.arange(len(connections)), [np.atleast_2d(conn).shape[0] for conn in connections])
+        frame = pd.DataFrame({'plane': plane, 'coordination': degree})
+        stats = frame.groupby('plane')['coordination'].agg(['mean', 'max'])
+        stats.columns = ['coordination_mean', 'coordination_max']
+        stats['isolated_pores'] = frame['coordination'].eq(0).groupby(frame['plane']).sum()
+        return stats.reindex(self._planes())
+
+    def group_sizes(self, workers = None):
+        """
+        flat arrays of (plane, group size) for every connected group
+        """
+        self.network.generate_connection_groups(workers = workers)
+        sizes = [[len(group) for group in self.network.connection_groups.get(plane_num, {})] for plane_num in range(self.num_planes)]
+        return np.repeat(np.arange(self.num_planes), [len(size) for size in sizes]), np.fromiter((s for size in sizes for s in size), dtype = int)
+
+    def groups(self, workers = None):
+        plane, size = self.group_sizes(workers = workers)
+        frame = pd.DataFrame({'plane': plane, 'size': size})
+        stats = frame.groupby('plane')['size'].agg(['count', 'mean', 'max'])
+        stats.columns = ['num_groups', 'group_size_mean', 'group_size_max']
+        stats = stats.reindex(self._planes())
+        stats['num_groups'] = stats['num_groups'].fillna(0).astype(int)
+        return stats
+
+    def summary(self, workers = None):
+        """
+        tidy table indexed by plane with pore sizes, porosity,
+            coordination and group statistics
+        """
+        maxballs = self.max_balls.groupby('plane')['radius'].agg(['count', 'mean'])
+        maxballs.columns = ['num_maxballs', 'maxball_radius_mean']
+        return pd.concat([self.pore_sizes(), self.porosity(), self.coordination(), self.groups(workers = workers),
+                            maxballs.reindex(self._planes())], axis = 1)
+
+    def pore_size_distribution(self, bins = 20, range = None):
+        """
+        histogram of pore radii per plane; columns are the bin centers
+        """
+        edges = np.histogram_bin_edges(self.pores['radius'].values, bins = bins, range = range)
+        counts, _, _ = np.histogram2d(self.pores['plane'].values, self.pores['radius'].values,
+                                        bins = [np.arange(self.num_planes + 1) - 0.5, edges])
+        return pd.DataFrame(counts.astype(int), index = self._planes(), columns = pd.Index(0.5*(edges[:-1] + edges[1:]), name = 'radius'))
+
+    def group_size_histogram(self, workers = None):
+        """
+        number of groups of each size per plane; columns are group sizes
+        """
+        plane, size = self.group_sizes(workers = workers)
+        max_size = size.max() if size.size > 0 else 1
+        counts = np.bincount(plane*(max_size + 1) + size, minlength = self.num_planes*(max_size + 1)).reshape(self.num_planes, max_size + 1)
+        return pd.DataFrame(counts[:, 2:], index = self._planes(), columns = pd.Index(np.arange(2, max_size + 1), name = 'group_size'))
@@ -0,0 +1,223 @@
+# ########################################## #
+#   Throughput benchmarks per pipeline stage #
+# ########################################## #
+
+import numpy as np
+import json
+import sys
+import io
+import platform
+import resource
+import multiprocessing
+import argparse
+import tempfile
+import subprocess
+from queue import Empty
+from contextlib import redirect_stdout
+from datetime import datetime
+from os import path, makedirs, environ, pathsep
+from time import perf_counter
+from . import synthetic
+
+class StageSkipped(Exception):
+    """
+    raised by a stage whose optional dependency is missing; any other error fails the case
+    """
+
+# ### stages: each takes (size, work_dir) and returns (items, unit) ### #
+def _lattice(size, work_dir):
+    synthetic.lattice_pack(size)
+    return size**3, 'voxels/s'
+
+def _random_pack(size, work_dir):
+    synthetic.random_pack(size)
+    return size**3, 'voxels/s'
+
+def _pack_slicer(size, work_dir, compact = False):
+    from ..preprocess.packslicer import PackSlicer
+    slicer = PackSlicer(filename = 'pack_' + str(size) + '.txt', filepath = work_dir, voxel = 'solid', compact = compact)
+    slicer.trim_data()
+    slicer.plane_slice(direction = 'x', incremental = False)
+    return size**3, 'voxels/s'
+
+def _pack_slicer_compact(size, work_dir):
+    return _pack_slicer(size, work_dir, compact = True)
+
+def _image_reader(size, work_dir):
+    from ..preprocess.image import ImageReader
+    reader = ImageReader.from_image_stack(stack_path = work_dir, stack_name = 'stack_' + str(size) + '.tif')
+    reader.output_2_csv(direction = 'z', incremental = False)
+    return size**3, 'voxels/s'
+
+def _volume_file(size, work_dir):
+    return path.join(work_dir, 'volume_' + str(size) + '.npy')
+
+def _measures(size, work_dir):
+    from ..preprocess.measures import volume_measures
+    volume_measures(np.load(_volume_file(size, work_dir)), workers = 1)
+    return size**3, 'voxels/s'
+
+def _extraction(size, work_dir):
+    from ..analytics.extraction import PoreExtractor
+    PoreExtractor(np.load(_volume_file(size, work_dir)))(workers = 1)
+    return size**3, 'voxels/s'
+
+def _pore_network(size, work_dir):
+    from ..analytics.classification import PoreNetwork2D
+    network = PoreNetwork2D(file_path = path.join(work_dir, 'network_' + str(size)))
+    network.statistics(workers = 1)
+    return size*len(network.pores), 'pores/s'
+
+def _luba_still(size, work_dir):
+    sys.path.insert(0, path.join(path.dirname(path.dirname(path.abspath(__file__))), 'test_packs'))
+    try:
+        from random_packs import LubaStill2D
+    except ImportError as error:
+        raise StageSkipped(str(error))
+    LubaStill2D(size, 16, 10, 0.01, 0.1)()
+    return size, 'events/s'
+
+def _startup(command, size):
+    package = __package__.split('.')[0]
+    root = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
+    env = dict(environ, PYTHONPATH = root + pathsep + environ.get('PYTHONPATH', ''))
+    for _ in range(size):
+        subprocess.run([sys.executable] + [arg.format(package = package) for arg in command], env = env,
+                        check = True, stdout = subprocess.DEVNULL)
+    return size, 'starts/s'
+
+def _cli_startup(size, work_dir):
+    return _startup(['-m', '{package}', '--help'], size)
+
+def _slice_startup(size, work_dir):
+    return _startup(['-c', 'import {package}.cli, {package}.preprocess.packslicer'], size)
+
+STAGES = {'lattice': _lattice, 'random_pack': _random_pack, 'pack_slicer': _pack_slicer,
+            'pack_slicer_compact': _pack_slicer_compact,
+            'image_reader': _image_reader, 'measures': _measures, 'extraction': _extraction,
+                'pore_network': _pore_network, 'luba_still': _luba_still,
+                    'cli_startup': _cli_startup, 'slice_startup': _slice_startup}
+
+SIZES = {'lattice': [16, 32, 48], 'random_pack': [32, 64, 128], 'pack_slicer': [16, 32, 64],
+            'pack_slicer_compact': [16, 32, 64],
+            'image_reader': [32, 64, 128], 'measures': [32, 64, 128], 'extraction': [32, 64, 128],
+                'pore_network': [100, 400, 1600], 'luba_still': [50, 100, 200],
+                    'cli_startup': [10], 'slice_startup': [10]}
+
+# ### inputs are generated once in the parent so they are not measured ### #
+def prepare_inputs(stage, size, work_dir):
+    if stage.startswith('pack_slicer') and not path.isfile(path.join(work_dir, 'pack_' + str(size) + '.txt')):
+        synthetic.write_pack(synthetic.random_pack(size), path.join(work_dir, 'pack_' + str(size) + '.txt'))
+    elif stage == 'image_reader' and not path.isfile(path.join(work_dir, 'stack_' + str(size) + '.tif')):
+        synthetic.write_tiff_stack(synthetic.random_pack(size), path.join(work_dir, 'stack_' + str(size) + '.tif'))
+    elif stage in ('measures', 'extraction') and not path.isfile(_volume_file(size, work_dir)):
+        np.save(_volume_file(size, work_dir), synthetic.random_pack(size))
+    elif stage == 'pore_network' and not path.isdir(path.join(work_dir, 'network_' + str(size))):
+        synthetic.write_network(path.join(work_dir, 'network_' + str(size)), size)
+
+def _run_case(stage, size, work_dir, queue):
+    try:
+        with redirect_stdout(io.StringIO()):
+            start = perf_counter()
+            items, unit = STAGES[stage](size, work_dir)
+            wall_time = perf_counter() - start
+        queue.put({'stage': stage, 'size': size, 'wall_time': wall_time, 'items': items,
+                    'throughput': items/wall_time if wall_time > 0 else float('inf'), 'unit': unit,
+                        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024, 'status': 'ok'})
+    except StageSkipped as error:
+        queue.put({'stage': stage, 'size': size, 'status': 'skipped: ' + str(error)})
+    except Exception as error:
+        queue.put({'stage': stage, 'size': size, 'status': 'failed: ' + type(error).__name__ + ': ' + str(error)})
+
+def _wait_result(stage, size, process, queue, timeout = None):
+    """
+    result of a case process; a process that dies without one (segfault, OOM kill)
+        or runs past timeout seconds fails the case
+    """
+    start = perf_counter()
+    while True:
+        try:
+            return queue.get(timeout = 1)
+        except Empty:
+            if not process.is_alive():
+                try:
+                    return queue.get(timeout = 1)
+                except Empty:
+                    return {'stage': stage, 'size': size, 'status': 'failed: exit code ' + str(process.exitcode)}
+            if timeout is not None and perf_counter() - start > timeout:
+                process.terminate()
+                return {'stage': stage, 'size': size, 'status': 'failed: timeout after ' + str(timeout) + ' s'}
+
+def run_case(stage, size, work_dir, repeat = 1, timeout = None):
+    """
+    runs a case in a fresh process per repeat so the peak RSS belongs to the case;
+        the fastest repeat is reported
+    """
+    prepare_inputs(stage, size, work_dir)
+    context = multiprocessing.get_context('spawn')
+    best = None
+    for _ in range(repeat):
+        queue = context.Queue()
+        process = context.Process(target = _run_case, args = (stage, size, work_dir, queue))
+        process.start()
+        result = _wait_result(stage, size, process, queue, timeout = timeout)
+        process.join()
+        if result['status'] != 'ok':
+            return result
+        if best is None or result['wall_time'] < best['wall_time']:
+            best = result
+    return best
+
+def run(stages = None, sizes = None, work_dir = None, repeat = 1, timeout = None):
+    if work_dir is None:
+        work_dir = tempfile.mkdtemp(prefix = 'poreanalytics_bench_')
+    if not path.isdir(work_dir):
+        makedirs(work_dir)
+    results = []
+    for stage in (stages or list(STAGES.keys())):
+        for size in (sizes or SIZES[stage]):
+            result = run_case(stage, size, work_dir, repeat = repeat, timeout = timeout)
+            print(json.dumps(result))
+            results.append(result)
+    return {'created': datetime.now().isoformat(), 'python': platform.python_version(),
+                'numpy': np.__version__, 'machine': platform.machine(), 'results': results}
+
+def compare(current, baseline, threshold = 0.1):
+    """
+    cases of current that are slower than baseline by more than threshold or failed
+    """
+    reference = {(result['stage'], result['size']): result for result in baseline['results'] if result['status'] == 'ok'}
+    regressions = []
+    for result in current['results']:
+        key = (result['stage'], result['size'])
+        if result['status'].startswith('failed'):
+            regressions.append({'stage': key[0], 'size': key[1], 'status': result['status']})
+        elif result['status'] == 'ok' and key in reference:
+            ratio = reference[key]['throughput']/result['throughput']
+            if ratio > 1 + threshold:
+                regressions.append({'stage': key[0], 'size': key[1], 'slowdown': ratio})
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'benchmark every pipeline stage on synthetic inputs')
+    parser.add_argument('--stages', nargs = '*', type=str, default = None, help='stages to run: ' + '/'.join(STAGES.keys()))
+    parser.add_argument('--sizes', nargs = '*', type=int, default = None, help='size sweep; voxels per edge or pores per plane')
+    parser.add_argument('--repeat', nargs = '?', type=int, default = 1, help='repeats per case; the fastest is kept')
+    parser.add_argument('--work_dir', nargs = '?', type=str, default = None, help='directory of generated inputs')
+    parser.add_argument('--output', nargs = '?', type=str, default = 'bench_results.json', help='json output file')
+    parser.add_argument('--baseline', nargs = '?', type=str, default = None, help='json results to compare against')
+    parser.add_argument('--timeout', nargs = '?', type=float, default = None, help='seconds before a case fails')
+    parser.add_argument('--threshold', nargs = '?', type=float, default = 0.1, help='allowed slowdown before flagging')
+    args = parser.parse_args()
+
+    report = run(stages = args.stages, sizes = args.sizes, work_dir = args.work_dir, repeat = args.repeat, timeout = args.timeout)
+    if args.baseline is not None:
+        with open(args.baseline) as baseline_file:
+            report['regressions'] = compare(report, json.load(baseline_file), threshold = args.threshold)
+        for regression in report['regressions']:
+            print('regression: ', regression)
+    with open(args.output, 'w') as output_file:
+        json.dump(report, output_file, indent = 2)
+    if args.baseline is not None and len(report['regressions']) > 0:
+        sys.exit(1)
@@ -0,0 +1,69 @@
+# ##################################### #
+#   Deterministic synthetic inputs      #
+# ##################################### #
+
+import numpy as np
+import pandas as pd
+from os import path, makedirs
+from scipy import ndimage
+from PIL import Image
+from ..preprocess.packs import Lattice
+
+def lattice_pack(size, radius = None, clearance = 0):
+    """
+    binary (1 = solid) lattice pack of size^3 voxels
+    """
+    pack = Lattice(bounds = [size]*3, radius = radius or max(1, size//8), clearance = clearance)
+    pack._dispense()
+    pack.define_domain(clearance = clearance)
+    return pack.domain.astype(int)
+
+def random_pack(size, radius = None, solid_fraction = 0.6, seed = 0):
+    """
+    binary (1 = solid) pack of overlapping spheres at random centers
+    """
+    radius = radius or max(1, size//10)
+    rng = np.random.RandomState(seed)
+    num_spheres = max(1, int(-np.log(1 - solid_fraction)*size**3/(4/3*np.pi*radius**3)))
+    centers = np.ones((size, size, size), dtype = bool)
+    centers[tuple(rng.randint(0, size, (3, num_spheres)))] = False
+    return (ndimage.distance_transform_edt(centers) <= radius).astype(int)
+
+def write_pack(volume, file_name, voxel_size = 1e-6):
+    """
+    writes a pack in the text layout of Lattice.print_domain read by PackSlicer
+    """
+    header = str(voxel_size) + ' \n' + ' '.join(str(val) for val in volume.shape)
+    np.savetxt(file_name, volume.flatten(), delimiter = ' ', fmt = '%d', header = header)
+    return file_name
+
+def write_tiff_stack(volume, file_name):
+    """
+    multi frame RGB tiff with the red channel set on solid voxels,
+        the layout read by ImageReader.from_image_stack
+    """
+    frames = []
+    for frame in range(volume.shape[2]):
+        red = (255*(volume[:,:,frame] > 0)).astype(np.uint8)
+        frames.append(Image.fromarray(np.stack((red, np.zeros_like(red), np.zeros_like(red)), axis = -1), mode = 'RGB'))
+    frames[0].save(file_name, save_all = True, append_images = frames[1:])
+    return file_name
+
+def write_network(save_dir, num_pores, num_planes = 4, mean_coordination = 3, seed = 0, extent = 1000.0):
+    """
+    pores*, maxball* and connections* files with num_pores pores per plane
+    """
+    if not path.isdir(save_dir):
+        makedirs(save_dir)
+    rng = np.random.RandomState(seed)
+    for plane in range(num_planes):
+        pd.DataFrame({'id': np.arange(num_pores), 'x': rng.uniform(0, extent, num_pores), 'y': rng.uniform(0, extent, num_pores),
+                        'radius': rng.uniform(1, 0.5*extent/np.sqrt(num_pores), num_pores)}).to_csv(
+                            path.join(save_dir, 'pores_' + str(plane) + '.csv'), sep = ',', header = True, index = False)
+        num_balls = 3*num_pores
+        pd.DataFrame({'x': rng.uniform(0, extent, num_balls), 'y': rng.uniform(0, extent, num_balls),
+                        'radius': rng.uniform(0.5, 0.5*extent/np.sqrt(num_pores), num_balls), 'rank': rng.randint(0, 5, num_balls)}).to_csv(
+                            path.join(save_dir, 'maxball_' + str(plane) + '.csv'), sep = ',', header = True, index = False)
+        connections = np.triu(rng.random_sample((num_pores, num_pores)) < mean_coordination/max(1, num_pores - 1), 1)
+        np.savetxt(path.join(save_dir, 'connections_' + str(plane) + '.txt'), (connections | connections.T).astype(int), fmt = '%d')
+    return save_dir
@@ -0,0 +1,151 @@
+# ################################# #
+#   poreanalytics command line      #
+# ################################# #
+
+# every subcommand imports its modules when it runs, so generating or slicing
+# a volume never pays for pandas or matplotlib; keep heavy imports out of here
+import argparse
+from os import getcwd, path, makedirs
+
+def _generate(args):
+    from .preprocess.packs import Lattice
+    pack = Lattice(bounds = args.bounds, radius = args.radius, clearance = args.clearance)
+    pack(output = args.output, domain = args.domain)
+    if 'plot' in args.output:
+        import matplotlib.pyplot as plt
+        plt.show()
+
+def _slice(args):
+    from .preprocess.packslicer import PackSlicer
+    if args.filename.endswith('.ini'):
+        slicer = PackSlicer.from_ini_file(args.filename, filepath = args.filepath)
+    else:
+        call_args = {'domain_begin': None, 'domain_range': None, 'direction': args.direction, 'num_slice': args.num_slice}
+        if args.domain is not None:
+            call_args.update({'domain_begin': args.domain[:3], 'domain_range': args.domain[3:]})
+        slicer = PackSlicer(filename = args.filename, filepath = args.filepath, voxel = args.voxel, call_args = call_args,
+                                compact = args.compact, mmap = args.mmap)
+    if args.roi:
+        rois = [(roi[:3], roi[3:]) for roi in args.roi]
+        out_dirs = slicer.extract_rois(rois, slice = args.slice, direction = args.direction, num_slice = args.num_slice,
+                                        workers = args.workers, incremental = not args.full)
+        for out_dir in out_dirs.values():
+            print('ROI written to ', out_dir)
+        return
+    slicer.trim_data(slicer.call_args.get('domain_begin'), slicer.call_args.get('domain_range'))
+    if (slicer.call_args.get('slice') or args.slice) == 'plane':
+        slicer.plane_slice(direction = slicer.call_args.get('direction') or 'x', incremental = not args.full)
+    else:
+        slicer.volume_slice(num_slice = int(slicer.call_args.get('num_slice') or 4), incremental = not args.full)
+    if args.measures:
+        print(slicer.measures(workers = args.workers))
+
+def _load_images(args):
+    from .preprocess.image import ImageReader
+    if args.stack_name is not None:
+        reader = ImageReader.from_image_stack(stack_path = args.file_path, stack_name = args.stack_name)
+    else:
+        reader = ImageReader.from_image_files(file_path = args.file_path, stem_name = args.stem_name)
+    if args.crop is not None:
+        reader.trim_images(how = 'crop', min = args.crop[0], max = args.crop[1])
+    reader.output_2_csv(direction = args.direction, save_dir = args.save_dir, incremental = not args.full)
+    if args.measures:
+        print(reader.measures(workers = args.workers))
+
+def _analyze(args):
+    if args.stack_name is not None:
+        from .pipeline import run_image_stack
+        network = run_image_stack(args.file_path, args.stack_name, crop = args.crop, save_dir = args.save_dir,
+                                    workers = {'analyze': args.workers or 4}, write_network = args.write_network)
+    else:
+        from .analytics.classification import PoreNetwork2D
+        network = PoreNetwork2D(file_path = args.file_path)
+    statistics = network.statistics(workers = args.workers)
+    save_dir = args.save_dir or network.save_dir
+    if not path.isdir(save_dir):
+        makedirs(save_dir)
+    out_name = path.join(save_dir, 'network_statistics.csv')
+    statistics.to_csv(out_name)
+    print('statistics written to ', out_name)
+
+def _render(args):
+    from .analytics.classification import PoreNetwork2D
+    network = PoreNetwork2D(file_path = args.file_path)
+    network.render_planes(planes = args.planes, kinds = args.kinds, formats = args.formats,
+                            save_dir = args.save_dir, seed = args.seed, workers = args.workers)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog = 'poreanalytics', description = 'sphere packs, image stacks and pore networks')
+    parser.add_argument('--trace', type=str, default = None, metavar = 'DIR', help='write span reports and a chrome trace to this directory')
+    parser.add_argument('--trace_memory', action = 'store_true', help='sample the peak RSS in every span')
+    commands = parser.add_subparsers(dest = 'command', required = True)
+
+    generate = commands.add_parser('generate', help = 'generate a sphere pack')
+    generate.add_argument('-bounds', nargs = '+', type=int, required = True, help='three integers for domain size')
+    generate.add_argument('--pack', type=str, default = 'Lattice', choices = ['Lattice'], help='pack type: Lattice')
+    generate.add_argument('--radius', nargs = '?', type=float, help='radius of spheres for lattice pack')
+    generate.add_argument('--clearance', nargs = '?', type=float, default = 0, help='clearance between spheres for lattice pack')
+    generate.add_argument('--output', nargs = '?', type=str, default = 'print', help='type of output: print/plot')
+    generate.add_argument('--domain', nargs = '?', type=int, default = 1, help='domain type: 0 for void; 1 for solid')
+    generate.set_defaults(func = _generate)
+
+    slicer = commands.add_parser('slice', help = 'slice a pack file into csv inputs')
+    slicer.add_argument('filename', type=str, help='pack file or .ini file')
+    slicer.add_argument('--filepath', nargs = '?', type=str, default = getcwd(), help='path to the input file')
+    slicer.add_argument('--voxel', nargs = '?', type=str, default = 'solid', help='voxel type: solid/void')
+    slicer.add_argument('--slice', nargs = '?', type=str, default = 'plane', help='plane/volume')
+    slicer.add_argument('--direction', nargs = '?', type=str, default = 'x', help='direction of plane slicing')
+    slicer.add_argument('--num_slice', nargs = '?', type=int, default = 4, help='number of volumetric slices')
+    slicer.add_argument('--domain', nargs = 6, type=int, default = None, help='begin x y z and range x y z')
+    slicer.add_argument('--full', action = 'store_true', help='regenerate every slice, ignoring the manifest')
+    slicer.add_argument('--compact', action = 'store_true', help='hold the pack run length encoded instead of int64')
+    slicer.add_argument('--mmap', action = 'store_true', help='memory map a cached .npy copy of the pack')
+    slicer.add_argument('--roi', nargs = 6, type=int, action = 'append', default = None,
+                            help='begin x y z and range x y z of a region of interest; repeat for several ROIs')
+    slicer.add_argument('--measures', action = 'store_true', help='print porosity, surface and Euler measures')
+    slicer.add_argument('--workers', nargs = '?', type=int, default = None, help='number of processes (threads for ROIs)')
+    slicer.set_defaults(func = _slice)
+
+    images = commands.add_parser('load-images', help = 'convert an image stack or image files to csv inputs')
+    images.add_argument('--file_path', nargs = '?', type=str, default = getcwd(), help='path to the images')
+    images.add_argument('--stack_name', nargs = '?', type=str, default = None, help='multi frame tiff stack')
+    images.add_argument('--stem_name', nargs = '?', type=str, default = None, help='common part of image file names')
+    images.add_argument('--direction', nargs = '?', type=str, default = 'z', help='slicing direction')
+    images.add_argument('--crop', nargs = 2, type=int, default = None, help='in plane crop: min max')
+    images.add_argument('--save_dir', nargs = '?', type=str, default = None, help='output directory; default is PoreNet_Inputs_<stack>_<shape> in file_path')
+    images.add_argument('--full', action = 'store_true', help='regenerate every slice, ignoring the manifest')
+    images.add_argument('--measures', action = 'store_true', help='print porosity, surface and Euler measures')
+    images.add_argument('--workers', nargs = '?', type=int, default = None, help='number of processes')
+    images.set_defaults(func = _load_images)
+
+    analyze = commands.add_parser('analyze', help = 'pore network statistics from network files or an image stack')
+    analyze.add_argument('--file_path', nargs = '?', type=str, default = getcwd(), help='network files or tiff stack directory')
+    analyze.add_argument('--stack_name', nargs = '?', type=str, default = None, help='extract the network from this tiff stack')
+    analyze.add_argument('--crop', nargs = 2, type=int, default = None, help='in plane crop of the stack: begin end')
+    analyze.add_argument('--save_dir', nargs = '?', type=str, default = None, help='output directory')
+    analyze.add_argument('--write_network', action = 'store_true', help='write pores, maxball and connections files')
+    analyze.add_argument('--workers', nargs = '?', type=int, default = None, help='number of processes')
+    analyze.set_defaults(func = _analyze)
+
+    render = commands.add_parser('render', help = 'render pores, groups and maxballs of every plane')
+    render.add_argument('--file_path', nargs = '?', type=str, default = getcwd(), help='path to the network files')
+    render.add_argument('--planes', nargs = '*', type=int, default = None, help='plane numbers; default is all planes')
+    render.add_argument('--kinds', nargs = '+', type=str, default = ['pores', 'groups', 'maxballs'], help='pores/groups/maxballs')
+    render.add_argument('--formats', nargs = '+', type=str, default = ['png'], help='png/svg')
+    render.add_argument('--save_dir', nargs = '?', type=str, default = None, help='output directory')
+    render.add_argument('--seed', nargs = '?', type=int, default = 0, help='color seed')
+    render.add_argument('--workers', nargs = '?', type=int, default = None, help='number of processes')
+    render.set_defaults(func = _render)
+    return parser
+
+def main(argv = None):
+    args = build_parser().parse_args(argv)
+    if args.trace is not None:
+        from .utils.tracing import tracer
+        tracer.enable(memory = args.trace_memory)
+        if not path.isdir(args.trace):
+            makedirs(args.trace)
+    args.func(args)
+    if args.trace is not None:
+        tracer.write_run(args.trace, stem = args.command)
+    return 0
@@ -0,0 +1,180 @@
+# ################################################ #
+#   Streaming pipeline: image stack => pore network #
+# ################################################ #
+
+import argparse
+import threading
+from queue import Queue
+from os import path, makedirs
+from datetime import date
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from .utils.tracing import tracer
+
+_DONE = object()
+
+class Stage:
+    """
+    one step of a Pipeline
+        func: called with the payload of every item; returning None drops the item
+        workers: number of threads of the stage
+        processes: run func in a process pool of size workers; the threads only
+            hand payloads over, so func and payloads must be picklable
+        with_index: call func(index, payload) with the source position of the item
+    """
+    def __init__(self, name, func, workers = 1, processes = False, with_index = False):
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.processes = processes
+        self.with_index = with_index
+
+class Pipeline:
+    """
+    stages connected by bounded queues of (index, payload) items
+        every stage runs concurrently in its own threads, so at most queue_size
+        items wait between two stages and nothing is materialized on disk
+        unless a stage writes it; results come back ordered by index
+    """
+    def __init__(self, stages, queue_size = 8):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.errors = []
+
+    def _feed(self, source, out_queue, num_next):
+        try:
+            for index, payload in enumerate(source):
+                if self.errors:
+                    break
+                out_queue.put((index, payload))
+        except Exception as error:
+            self.errors.append(error)
+        for _ in range(num_next):
+            out_queue.put(_DONE)
+
+    def _work(self, stage, in_queue, out_queue, executor, finished, num_next):
+        while True:
+            item = in_queue.get()
+            if item is _DONE:
+                break
+            if self.errors:
+                continue
+            index, payload = item
+            try:
+                args = (index, payload) if stage.with_index else (payload,)
+                with tracer.span('pipeline.' + stage.name, items = 1):
+                    result = executor.submit(stage.func, *args).result() if executor else stage.func(*args)
+                if result is not None:
+                    out_queue.put((index, result))
+            except Exception as error:
+                self.errors.append(error)
+        with finished['lock']:
+            finished['count'] += 1
+            if finished['count'] == stage.workers:
+                for _ in range(num_next):
+                    out_queue.put(_DONE)
+
+    def run(self, source):
+        """
+        source: iterable of payloads for the first stage
+        returns the payloads leaving the last stage ordered by source position
+        """
+        queues = [Queue(maxsize = self.queue_size) for _ in range(len(self.stages) + 1)]
+        executors = [ProcessPoolExecutor(max_workers = stage.workers) if stage.processes else None for stage in self.stages]
+        threads = [threading.Thread(target = self._feed, args = (source, queues[0], self.stages[0].workers), daemon = True)]
+        for count, stage in enumerate(self.stages):
+            num_next = self.stages[count + 1].workers if count + 1 < len(self.stages) else 1
+            finished = {'count': 0, 'lock': threading.Lock()}
+            threads.extend([threading.Thread(target = self._work, daemon = True,
+                                args = (stage, queues[count], queues[count + 1], executors[count], finished, num_next))
+                                    for _ in range(stage.workers)])
+        for thread in threads:
+            thread.start()
+
+        results = []
+        while True:
+            item = queues[-1].get()
+            if item is _DONE:
+                break
+            results.append(item)
+        for thread in threads:
+            thread.join()
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown()
+        if self.errors:
+            raise self.errors[0]
+        return [payload for _, payload in sorted(results, key = lambda item: item[0])]
+
+# ### stages of the image stack => pore network run ### #
+def _crop(frame, crop = None):
+    if crop is None:
+        return frame
+    begin, end = crop
+    return frame[begin:end, begin:end]
+
+def _extract(frame, void = 0, min_radius = 1.0, voxel_size = 1):
+    from .analytics.extraction import PoreExtractor
+    return PoreExtractor.extract_plane(frame, void = void, min_radius = min_radius, voxel_size = voxel_size)
+
+def _write_csv(count, frame, save_dir = None, sep = ' '):
+    """
+    writes a frame as the input_image_<count>.csv file of ImageReader.output_2_csv
+    """
+    from .preprocess.image import ImageReader
+    ImageReader._to_df(frame).to_csv(path.join(save_dir, 'input_image_' + str(count) + '.csv'), sep = sep,
+                                        header = True, index = False, float_format = '%d')
+    return frame
+
+def run_image_stack(stack_path, stack_name, crop = None, void = 0, min_radius = 1.0, voxel_size = 1,
+                        workers = None, queue_size = 8, write_csv = False, write_network = False, save_dir = None):
+    """
+    streams the frames of a tiff stack through cropping, optional csv export and
+        pore extraction, and returns a PoreNetwork2D built in memory
+    crop: (begin, end) in plane crop as in ImageReader.trim_images
+    workers: worker counts per stage, keys preprocess, slice and analyze;
+        analyze runs in a process pool when it has more than one worker
+    write_csv: also write the input_image_* files of ImageReader.output_2_csv
+    write_network: also write the pores*, maxball* and connections* files
+    the network saves plots and tables to the Post_Processed_Data<date> subdirectory of save_dir
+    """
+    from .preprocess.image import ImageReader
+    from .analytics.extraction import PoreExtractor
+    workers = dict({'preprocess': 1, 'slice': 2, 'analyze': 4}, **(workers or {}))
+    if save_dir is None:
+        save_dir = path.join(stack_path, 'PoreNet_Pipeline_' + date.today().strftime('%Y-%m-%d'))
+    if (write_csv or write_network) and not path.isdir(save_dir):
+        makedirs(save_dir)
+
+    stages = [Stage('preprocess', partial(_crop, crop = crop), workers = workers['preprocess'])]
+    if write_csv:
+        stages.append(Stage('slice', partial(_write_csv, save_dir = save_dir), workers = workers['slice'], with_index = True))
+    stages.append(Stage('analyze', partial(_extract, void = void, min_radius = min_radius, voxel_size = voxel_size),
+                        workers = workers['analyze'], processes = workers['analyze'] > 1))
+    results = Pipeline(stages, queue_size = queue_size).run(ImageReader.iter_stack_frames(stack_path, stack_name))
+
+    extractor = PoreExtractor(None, void = void, min_radius = min_radius, voxel_size = voxel_size)
+    extractor._collect([results])
+    if write_network:
+        extractor.to_files(save_dir)
+    return extractor.to_network(file_path = save_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'image stack to pore network without intermediate files')
+    parser.add_argument('-stack_name', nargs = '?', type=str, required = True, help='name of the tiff stack')
+    parser.add_argument('--stack_path', nargs = '?', type=str, default = './', help='path to the tiff stack')
+    parser.add_argument('--crop', nargs = 2, type=int, default = None, help='in plane crop: begin end')
+    parser.add_argument('--preprocess_workers', nargs = '?', type=int, default = 1, help='threads of the crop stage')
+    parser.add_argument('--slice_workers', nargs = '?', type=int, default = 2, help='threads of the csv export stage')
+    parser.add_argument('--analyze_workers', nargs = '?', type=int, default = 4, help='processes of the extraction stage')
+    parser.add_argument('--queue_size', nargs = '?', type=int, default = 8, help='frames buffered between stages')
+    parser.add_argument('--write_csv', action = 'store_true', help='write the input_image csv files')
+    parser.add_argument('--write_network', action = 'store_true', help='write pores, maxball and connections files')
+    args = parser.parse_args()
+
+    network = run_image_stack(args.stack_path, args.stack_name, crop = args.crop, queue_size = args.queue_size,
+                                workers = {'preprocess': args.preprocess_workers, 'slice': args.slice_workers,
+                                            'analyze': args.analyze_workers},
+                                    write_csv = args.write_csv, write_network = args.write_network)
+    print(network.statistics())
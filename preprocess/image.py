@@ -2,24 +2,28 @@
 #       Image Reader              #
 # ############################### #
 
+# pandas, PIL and natsort are imported where they are used to keep imports cheap
 import numpy as np
-import pandas as pd
 from os import path, makedirs, getcwd, listdir
-from natsort import natsorted 
-from PIL import Image, ImageFilter 
-from datetime import date
 import argparse
 import sys
-from PIL.ImageFilter import (SMOOTH)
+from .measures import volume_measures
+from ..utils.tracing import tracer, file_size
+from ..utils.manifest import SliceManifest
+from .pyramid import VoxelPyramid
 
 class ImageReader:
     """
     generating input information from stack of images, 
     or collection of image files
     """
-    def __init__(self, stack_array, file_path):
+    def __init__(self, stack_array, file_path, source_name = None):
+        """
+        source_name: stack file or stem name of the images; names the pyramid file
+        """
         self.stack_array = stack_array
         self.file_path = file_path 
+        self.source_name = source_name
 
     @property
     def shape(self):
@@ -39,21 +43,27 @@ class ImageReader:
     
     @staticmethod 
     def _to_df(slice_array):
+        import pandas as pd
         slice_df = pd.DataFrame(columns = ['x','y'])
         index = np.where(slice_array == 1)
         slice_df['x'] = index[0]
         slice_df['y'] = index[1]
         return slice_df 
 
-    def output_2_csv(self, direction = 'z', sep =' '):
-
+    def output_2_csv(self, direction = 'z', sep =' ', save_dir = None, incremental = True):
+        """
+        save_dir: None writes to PoreNet_Inputs_<source name>_<shape> in file_path; the name
+            does not change between runs, so later runs resume and update the same slices
+        incremental: skip slices whose voxels and parameters match the manifest in save_dir
+        """
         width, height, stack = self.stack_array.shape
-        save_dir = path.join(self.file_path, 'PoreNet_Inputs_' +
-            str(width) + 'x' + str(height) + 'x' + str(stack) + '_on_'  + date.today().strftime('%Y-%m-%d'))
+        if save_dir is None:
+            source = path.splitext(self.source_name)[0] + '_' if self.source_name else ''
+            save_dir = path.join(self.file_path, 'PoreNet_Inputs_' + source +
+                str(width) + 'x' + str(height) + 'x' + str(stack))
         if not path.exists(save_dir):
-            save_dir = makedirs(save_dir) 
-        else:
-            save_dir = save_dir        
+            makedirs(save_dir) 
+        manifest = SliceManifest(save_dir)
 
         axs_max = {'x': width, 'y': height, 'z': stack}[direction]
         axs_lin = np.arange(0, axs_max)
@@ -62,36 +72,88 @@ class ImageReader:
             axs_slice = {'z':(slice(0, width), slice(0, height), slice(ax_lim[0], ax_lim[1])) ,
                             'x':(slice(ax_lim[0], ax_lim[1]), slice(0, height), slice(0, stack)) ,
                                 'y':(slice(0, width), slice(ax_lim[0], ax_lim[1]), slice(0, stack))}[direction]
-            slice_df = ImageReader._to_df(np.squeeze(self.stack_array[axs_slice]))
+            out_name = path.join(save_dir, 'input_image_' + str(count) + '.csv')
+            digest = SliceManifest.digest(self.stack_array[axs_slice], direction = direction, sep = sep)
+            if incremental and manifest.is_current(out_name, digest):
+                continue
+            with tracer.span('image_reader.frame') as span:
+                slice_df = ImageReader._to_df(np.squeeze(self.stack_array[axs_slice]))
+                span.add(items = len(slice_df))
             columns = [col for col in ['x','y','z'] if col != direction]
             slice_df.columns = columns 
-            slice_df.to_csv(path.join(save_dir, 'input_image_' + str(count) + '.csv'), sep=sep, header=True, index = False, float_format = '%d')
+            with tracer.span('image_reader.write_csv', items = len(slice_df)) as span:
+                slice_df.to_csv(out_name, sep=sep, header=True, index = False, float_format = '%d')
+                if tracer.enabled:
+                    span.add(bytes_written = file_size(out_name))
+            manifest.record(out_name, digest)
+        manifest.prune(prefix = 'input_image_')
             
-    @classmethod 
-    def from_image_stack(cls, stack_path = None, stack_name = None):
+    def measures(self, void = 0, voxel_size = 1, chunk = 64, workers = None):
+        """
+        porosity profiles, specific surface and Euler characteristic of the
+            void phase in one streaming pass over slabs of the stack
+        """
+        return volume_measures(self.stack_array, void = void, voxel_size = voxel_size, chunk = chunk, workers = workers)
+
+    def build_pyramid(self, factors = (2, 4, 8), chunk = 64, save = True):
+        """
+        coarse levels of the stack for previews, porosity estimates and ROI selection;
+            saved as <stack or stem name>_pyramid.npz in file_path
+        """
+        self.pyramid = VoxelPyramid.from_volume(self.stack_array, factors = factors, chunk = chunk)
+        if save:
+            self.pyramid.save(VoxelPyramid.file_name(path.join(self.file_path, self.source_name or 'stack')))
+        return self.pyramid
+
+    @staticmethod
+    def iter_stack_frames(stack_path = None, stack_name = None):
+        """
+        yields the binary frames of a stack one at a time without loading the whole stack
+        """
+        from PIL import Image
         stack = Image.open(path.join(stack_path, stack_name))
-        w, h,_ = np.shape(stack)
-        stack_array = np.zeros((w, h, stack.n_frames))
         for frame in range(stack.n_frames):
             stack.seek(frame)
-            stack.filter(ImageFilter.MaxFilter(5))
-            r,_,_ = stack.split()
-            stack_array[:,:,frame] = np.array(r)
+            with tracer.span('image_reader.decode', items = 1):
+                r,_,_ = stack.split()
+                frame_array = np.array(r)
+            yield (frame_array > 0).astype(int)
+
+    @classmethod 
+    def from_image_stack(cls, stack_path = None, stack_name = None):
+        from PIL import Image, ImageFilter
+        with tracer.span('image_reader.decode') as span:
+            if tracer.enabled:
+                span.add(bytes_read = file_size(path.join(stack_path, stack_name)))
+            stack = Image.open(path.join(stack_path, stack_name))
+            w, h,_ = np.shape(stack)
+            stack_array = np.zeros((w, h, stack.n_frames))
+            for frame in range(stack.n_frames):
+                stack.seek(frame)
+                stack.filter(ImageFilter.MaxFilter(5))
+                r,_,_ = stack.split()
+                stack_array[:,:,frame] = np.array(r)
+            span.add(items = stack.n_frames)
         index = np.where(stack_array > 0)
         stack_array[index] = 1
-        return cls(stack_array, stack_path)
+        return cls(stack_array, stack_path, source_name = stack_name)
 
     @classmethod 
     def from_image_files(cls, file_path = None, stem_name = None):
+        from PIL import Image
+        from natsort import natsorted
         image_files = natsorted([_file for _file in listdir(file_path) if stem_name in _file], key = lambda y: y.lower())
         image_array = []
-        for _img in image_files:
-            image = Image.open(path.join(file_path, _img))
-            img,_,_ = image.split()
-            image_array.append(np.array(img))
+        with tracer.span('image_reader.decode', items = len(image_files)) as span:
+            for _img in image_files:
+                image = Image.open(path.join(file_path, _img))
+                img,_,_ = image.split()
+                image_array.append(np.array(img))
+                if tracer.enabled:
+                    span.add(bytes_read = file_size(path.join(file_path, _img)))
         image_array = np.array(image_array)
         image_array = np.swapaxes(image_array, 0, 2)
         index = np.where(image_array > 0)
         image_array[index] = 1
-        return cls(image_array, file_path)
+        return cls(image_array, file_path, source_name = stem_name)
 
@@ -0,0 +1,80 @@
+# ################################## #
+#   Streaming voxel volume measures  #
+# ################################## #
+
+import numpy as np
+from collections import namedtuple
+from ..utils.tools import process_map
+
+VolumeMeasures = namedtuple('VolumeMeasures', ['porosity', 'porosity_x', 'porosity_y', 'porosity_z',
+                                                'specific_surface', 'euler_characteristic', 'voxels'])
+
+def _pairs(array, axis):
+    """
+    logical or of neighbouring entries along axis
+    """
+    lower = [slice(None)]*array.ndim
+    upper = [slice(None)]*array.ndim
+    lower[axis], upper[axis] = slice(None, -1), slice(1, None)
+    return array[tuple(lower)] | array[tuple(upper)]
+
+def _slab_measures(task):
+    """
+    counts of one slab of planes [begin, end) along x
+        slab carries one halo plane in front (empty for the first slab) so the
+        elements on the plane x = begin are counted by this slab only;
+        the last slab also closes the plane x = end
+    """
+    slab, void, first, last = task
+    phase = np.asarray(slab) == void
+    if first:
+        phase[0] = False
+    own = phase[1:]
+    counts = {'void_x': own.sum(axis = (1, 2)), 'void_y': own.sum(axis = (0, 2)), 'void_z': own.sum(axis = (0, 1))}
+
+    # solid-void interfaces inside the domain
+    x_faces = own != phase[:-1]
+    if first:
+        x_faces = x_faces[1:]
+    counts['interfaces'] = int(x_faces.sum()) + int((own[:, 1:] != own[:, :-1]).sum()) + int((own[:, :, 1:] != own[:, :, :-1]).sum())
+
+    # euler characteristic of the union of closed voxels: V - E + F - C
+    padded = np.pad(phase, ((0, 1 if last else 0), (1, 1), (1, 1)))
+    cubes = padded[1:own.shape[0] + 1]
+    x_pairs = _pairs(padded, 0)
+    vertices = _pairs(_pairs(x_pairs, 1), 2).sum()
+    edges = _pairs(_pairs(cubes, 1), 2).sum() + _pairs(x_pairs[:, 1:-1, :], 2).sum() + _pairs(x_pairs[:, :, 1:-1], 1).sum()
+    faces = x_pairs[:, 1:-1, 1:-1].sum() + _pairs(cubes[:, :, 1:-1], 1).sum() + _pairs(cubes[:, 1:-1, :], 2).sum()
+    counts['euler'] = int(vertices) - int(edges) + int(faces) - int(own.sum())
+    return counts
+
+def _slabs(volume, chunk):
+    nx, ny, nz = volume.shape
+    for begin in range(0, nx, chunk):
+        end = min(begin + chunk, nx)
+        if begin == 0:
+            slab = np.concatenate((np.zeros((1, ny, nz), dtype = volume.dtype), np.asarray(volume[0:end])))
+        else:
+            slab = np.asarray(volume[begin - 1:end])
+        yield slab
+
+def volume_measures(volume, void = 0, voxel_size = 1, chunk = 64, workers = None):
+    """
+    porosity profiles, specific surface and Euler characteristic of the void phase
+        in one pass over slabs of chunk planes along x; volume may be any array
+        like object that supports slicing along x, e.g. a memory map
+    workers: processes as in process_map
+    """
+    nx, ny, nz = volume.shape
+    num_slabs = -(-nx//chunk)
+    tasks = ((slab, void, count == 0, count == num_slabs - 1) for count, slab in enumerate(_slabs(volume, chunk)))
+    results = list(process_map(_slab_measures, tasks, workers = workers))
+
+    voxels = nx*ny*nz
+    void_x = np.concatenate([result['void_x'] for result in results])
+    void_y = np.sum([result['void_y'] for result in results], axis = 0)
+    void_z = np.sum([result['void_z'] for result in results], axis = 0)
+    interfaces = sum(result['interfaces'] for result in results)
+    return VolumeMeasures(porosity = void_x.sum()/voxels, porosity_x = void_x/(ny*nz), porosity_y = void_y/(nx*nz),
+                            porosity_z = void_z/(nx*ny), specific_surface = interfaces/(voxels*voxel_size),
+                            euler_characteristic = sum(result['euler'] for result in results), voxels = voxels)
@@ -1,8 +1,5 @@
 
 import numpy as np
-import matplotlib
-import matplotlib.pyplot as plt
-from mpl_toolkits import mplot3d
 from collections import namedtuple
 import argparse
 
@@ -38,15 +35,25 @@ class Lattice:
         header = '1e-6 \n' + str(self.res_x) + ' ' + str(self.res_y) + ' ' +str(self.res_z)
         np.savetxt(self.save_name, self.domain.flatten(), delimiter =' ', fmt = '%d', header=header) 
     
-    def plot_domain(self, domain = 0):
+    def plot_domain(self, domain = 0, max_points = 200000):
         """
         domain: 0 for void
                 1 for solid
+        max_points: above this many voxels a coarse level of a VoxelPyramid is plotted
         """
-        solid_index = np.where(self.domain == domain)
+        import matplotlib.pyplot as plt
+        from mpl_toolkits import mplot3d
         fig = plt.figure(figsize=(8,8))
         axs = fig.add_subplot(111, projection = '3d')
-        axs.scatter(self.xx[solid_index], self.yy[solid_index], self.zz[solid_index], c= self.domain[solid_index], cmap='jet')
+        if np.count_nonzero(self.domain == domain) <= max_points:
+            solid_index = np.where(self.domain == domain)
+            axs.scatter(self.xx[solid_index], self.yy[solid_index], self.zz[solid_index], c= self.domain[solid_index], cmap='jet')
+        else:
+            from .pyramid import VoxelPyramid
+            pyramid = VoxelPyramid.from_volume(self.domain)
+            factor = pyramid.select_level(max_points, phase = domain)
+            x, y, z = pyramid.points(factor, phase = domain)
+            axs.scatter(x, y, z, c = np.full(x.shape, domain), cmap = 'jet', s = factor**2)
         return fig, axs
     
     def __call__(self, output = 'print', domain = 1):
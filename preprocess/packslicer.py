@@ -4,10 +4,15 @@
 # ##################### #
 
 import numpy as np
-import pandas as pd
-from os import path, makedirs, getcwd
+from os import path, makedirs, getcwd, remove
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 import sys
+from .measures import volume_measures
+from ..utils.tracing import tracer, file_size
+from ..utils.manifest import SliceManifest
+from .pyramid import VoxelPyramid
+from .sparse import RunLengthVolume
 
 class PackSlicer:
     """
@@ -20,9 +25,13 @@ class PackSlicer:
         python3 packslice.py <input>.ini
         use the instructions in the ini file to change inputs
     => stores the image stacks in a directory with a same file name + 'PoreNet_Inputs'
+    => compact = True keeps all data as a RunLengthVolume parsed slab by slab
+        instead of the int64 array of np.loadtxt
+    => mmap = True parses the pack once into <name>_voxels.npy and memory maps it
+        in this and every later run
     """ 
 
-    def __init__(self, filename = None, filepath = None,  voxel = None, call_args = None):
+    def __init__(self, filename = None, filepath = None,  voxel = None, call_args = None, compact = False, mmap = False):
         
         if filename == None:
             print('enter a filename; ...')
@@ -35,16 +44,40 @@ class PackSlicer:
             makedirs(self.save_path)
         self.voxel = voxel
         data_file = path.join(filepath, filename)
+        self.data_file = data_file
         file_info = open(data_file).read().splitlines()[0:2]
         self.voxel_size = float(file_info[0].split(' ')[1])
         self.x, self.y, self.z = tuple([int(val) for val in file_info[1].split(' ')[1:]])
-        self.all_data = np.loadtxt(data_file, dtype=int, skiprows = 2).reshape(self.x, self.y, self.z)
+        with tracer.span('pack_slicer.parse', items = self.x*self.y*self.z) as span:
+            if tracer.enabled:
+                span.add(bytes_read = file_size(data_file))
+            if compact:
+                self.all_data = RunLengthVolume.from_text(data_file, (self.x, self.y, self.z), skiprows = 2)
+            elif mmap:
+                self.all_data = PackSlicer._memory_map(data_file, (self.x, self.y, self.z))
+            else:
+                self.all_data = np.loadtxt(data_file, dtype=int, skiprows = 2).reshape(self.x, self.y, self.z)
         if call_args:
             self.call_args = call_args
         else:
             self.call_args = {}
     
-    _get_tuple = staticmethod(lambda line: tuple([elem for elem in line.split('=')[1].split(' ')]))
+    @staticmethod
+    def _memory_map(data_file, shape):
+        """
+        read only memory map of the voxels; the .npy cache is rebuilt when the pack file is newer
+        """
+        npy_file = path.splitext(data_file)[0] + '_voxels.npy'
+        if not path.isfile(npy_file) or path.getmtime(npy_file) < path.getmtime(data_file):
+            volume = RunLengthVolume.from_text(data_file, shape, skiprows = 2)
+            out_array = np.lib.format.open_memmap(npy_file, mode = 'w+', dtype = np.int8, shape = shape)
+            for begin in range(0, shape[0], 16):
+                out_array[begin:begin + 16] = np.asarray(volume[begin:begin + 16])
+            out_array.flush()
+            del out_array
+        return np.load(npy_file, mmap_mode = 'r')
+
+    _get_tuple = staticmethod(lambda line: tuple([int(elem) for elem in line.split('=')[1].split(' ') if elem.strip() != '']))
     _get_val = staticmethod(lambda line: line.split('=')[1])
 
     @classmethod
@@ -66,10 +99,14 @@ class PackSlicer:
                                         'direction':PackSlicer._get_val, 
                                         'slice':PackSlicer._get_val, 
                                          'num_slice':PackSlicer._get_val}[key](line)       
-        input_args.update(call_args)
-        return cls(**input_args)
+        input_args.pop('output')
+        return cls(call_args = call_args, **input_args)
 
     def trim_data(self, domain_begin = None, domain_range = None):
+        with tracer.span('pack_slicer.trim'):
+            self._trim_data(domain_begin, domain_range)
+
+    def _trim_data(self, domain_begin = None, domain_range = None):
         
         if domain_begin is None and domain_range is None:
             self.grid_x, self.grid_y, self.grid_z = self.x, self.y, self.z
@@ -81,50 +118,166 @@ class PackSlicer:
     
     @staticmethod
     def _generate_from_numpy_array(domain, voxel):
-        domain_frame = pd.DataFrame(columns = ['x','y','z'])
-        index = {'solid':1, 'void': 0}[voxel]
-        domain = np.where(domain == index)
-        domain_frame['x'] = domain[0]
-        domain_frame['y'] = domain[1]
-        domain_frame['z'] = domain[2]
+        import pandas as pd
+        with tracer.span('pack_slicer.frame') as span:
+            domain_frame = pd.DataFrame(columns = ['x','y','z'])
+            index = {'solid':1, 'void': 0}[voxel]
+            if isinstance(domain, RunLengthVolume):
+                domain = domain.coordinates(index)
+            else:
+                domain = np.where(domain == index)
+            domain_frame['x'] = domain[0]
+            domain_frame['y'] = domain[1]
+            domain_frame['z'] = domain[2]
+            span.add(items = len(domain_frame))
         return domain_frame
     
     @staticmethod
     def _to_csv(frame, outname, sep = ' ', voxel_size= 1):
         outname += '.csv'
-        frame *= voxel_size
-        frame.to_csv(outname, sep = sep, header=True, index=False, float_format = '%.9f')
+        with tracer.span('pack_slicer.write_csv', items = len(frame)) as span:
+            frame *= voxel_size
+            frame.to_csv(outname, sep = sep, header=True, index=False, float_format = '%.9f')
+            if tracer.enabled:
+                span.add(bytes_written = file_size(outname))
     
-    def plane_slice(self, thickness = 1, direction =  'x', dimension = 'voxel', output = 'csv', sep= ' '):
-        ax = {'x':self.grid_x, 'y':self.grid_y, 'z':self.grid_z}[direction]
+    def plane_slice(self, thickness = 1, direction =  'x', dimension = 'voxel', output = 'csv', sep= ' ', incremental = True,
+                        domain = None, save_path = None):
+        """
+        incremental: skip slices whose source voxels and parameters match the
+            manifest of an earlier (or interrupted) run in save_path
+        domain, save_path: default to the trimmed domain and self.save_path
+        """
+        domain = getattr(self, 'domain', self.all_data) if domain is None else domain
+        save_path = save_path or self.save_path
+        grid_x, grid_y, grid_z = domain.shape
+        ax = {'x':grid_x, 'y':grid_y, 'z':grid_z}[direction]
         ax_lin = np.arange(0, ax, thickness)
         voxel_size = {'voxel':1, 'real': self.voxel_size}[dimension]
+        # digests hash int voxels, so dense, compact and memory mapped data share manifests
+        manifest = SliceManifest(save_path)
 
         for count, ax_lim in enumerate(zip(ax_lin[:-1], ax_lin[1:])):
-            ax_slice = {'x':(slice(ax_lim[0], ax_lim[1]), slice(0, self.grid_y), slice(0, self.grid_z)), 
-                        'y': (slice(0, self.grid_x), slice(ax_lim[0], ax_lim[1]), slice(0, self.grid_z)),  
-                        'z': (slice(0, self.grid_x), slice(0, self.grid_z), slice(ax_lim[0], ax_lim[1]))}[direction]
+            ax_slice = {'x':(slice(ax_lim[0], ax_lim[1]), slice(0, grid_y), slice(0, grid_z)), 
+                        'y': (slice(0, grid_x), slice(ax_lim[0], ax_lim[1]), slice(0, grid_z)),  
+                        'z': (slice(0, grid_x), slice(0, grid_y), slice(ax_lim[0], ax_lim[1]))}[direction]
             out_columns = [col for col in ['x','y','z'] if direction not in col]
-            slice_frame = PackSlicer._generate_from_numpy_array(self.all_data[ax_slice], self.voxel)[out_columns]
+            out_name = path.join(save_path, 'Slice_in_' + direction + '_' + str(count))
+            digest = SliceManifest.digest(np.asarray(domain[ax_slice], dtype = int), voxel = self.voxel, columns = out_columns,
+                                            voxel_size = voxel_size, output = output, sep = sep)
+            if incremental and manifest.is_current(out_name + '.' + output, digest):
+                continue
+            slice_frame = PackSlicer._generate_from_numpy_array(domain[ax_slice], self.voxel)[out_columns]
             if not slice_frame.empty:
-                out_name = path.join(self.save_path, 'Slice_in_' + direction + '_' + str(count))
                 {'csv': PackSlicer._to_csv}[output](slice_frame, out_name, sep = sep, voxel_size= voxel_size)
+            elif path.isfile(out_name + '.' + output):
+                # the slice became empty; the file of an earlier run is stale
+                remove(out_name + '.' + output)
+            manifest.record(out_name + '.' + output, digest)
+        manifest.prune(prefix = 'Slice_in_' + direction + '_')
 
 
-    def volume_slice(self, num_slice = 4, output='csv', dimension = 'voxel', sep=' '):
+    def volume_slice(self, num_slice = 4, output='csv', dimension = 'voxel', sep=' ', incremental = True,
+                        domain = None, save_path = None):
+        domain = getattr(self, 'domain', self.all_data) if domain is None else domain
+        save_path = save_path or self.save_path
+        grid_x, grid_y, grid_z = domain.shape
         voxel_size = {'voxel': 1, 'real': self.voxel_size}[dimension]
-        x_lin = np.arange(0, self.grid_x, self.grid_x//num_slice)
-        y_lin = np.arange(0, self.grid_y, self.grid_y//num_slice)
-        z_lin = np.arange(0, self.grid_z, self.grid_z//num_slice)
+        x_lin = np.arange(0, grid_x, grid_x//num_slice)
+        y_lin = np.arange(0, grid_y, grid_y//num_slice)
+        z_lin = np.arange(0, grid_z, grid_z//num_slice)
+        manifest = SliceManifest(save_path)
         counter = 0
         for x_min, x_max in zip(x_lin[:-1], x_lin[1:]):
             for y_min, y_max in zip(y_lin[:-1], y_lin[1:]):
                 for z_min, z_max in zip(z_lin[:-1], z_lin[1:]):
-                    out_name = path.join(self.save_path, 'Volume_Slice_' + str(counter))
-                    slice_frame = PackSlicer._generate_from_numpy_array(self.all_data[x_min:x_max, y_min:y_max, z_min:z_max], voxel_size)
-                    {'csv': PackSlicer._to_csv}[output](slice_frame, out_name, sep = sep, voxel_size = voxel_size)
+                    out_name = path.join(save_path, 'Volume_Slice_' + str(counter))
                     counter += 1
+                    sub_volume = domain[x_min:x_max, y_min:y_max, z_min:z_max]
+                    digest = SliceManifest.digest(np.asarray(sub_volume, dtype = int), voxel = self.voxel, voxel_size = voxel_size, output = output, sep = sep)
+                    if incremental and manifest.is_current(out_name + '.' + output, digest):
+                        continue
+                    slice_frame = PackSlicer._generate_from_numpy_array(sub_volume, self.voxel)
+                    {'csv': PackSlicer._to_csv}[output](slice_frame, out_name, sep = sep, voxel_size = voxel_size)
+                    manifest.record(out_name + '.' + output, digest)
+        manifest.prune(prefix = 'Volume_Slice_')
     
+    @staticmethod
+    def roi_name(domain_begin, domain_range):
+        return 'ROI_' + '_'.join(str(int(val)) for val in tuple(domain_begin) + tuple(domain_range))
+
+    def check_rois(self, rois):
+        """
+        raises ValueError for ROIs that leave all data, have an empty range or repeat an earlier ROI
+        """
+        names = set()
+        for domain_begin, domain_range in rois:
+            name = PackSlicer.roi_name(domain_begin, domain_range)
+            if len(domain_begin) != 3 or len(domain_range) != 3:
+                raise ValueError(name + ': begin and range need three values')
+            if any(begin < 0 for begin in domain_begin) or any(extent <= 0 for extent in domain_range):
+                raise ValueError(name + ': begin must be >= 0 and range > 0')
+            if any(begin + extent > n for begin, extent, n in zip(domain_begin, domain_range, self.all_data.shape)):
+                raise ValueError(name + ': runs past the volume ' + str(tuple(self.all_data.shape)))
+            if name in names:
+                raise ValueError(name + ': duplicate ROI')
+            names.add(name)
+
+    def extract_rois(self, rois, slice = 'plane', direction = 'x', num_slice = 4, workers = None, incremental = True, **slice_args):
+        """
+        slices many regions of interest of the parsed pack in one job
+            rois: list of (domain_begin, domain_range)
+            => every ROI is a view of all_data (no copy for arrays and memory maps)
+                and is written to save_path/ROI_<begin>_<range> with its own manifest
+            => ROIs run concurrently in a thread pool; all_data is shared, never re-parsed
+        returns {roi name: output directory}
+        """
+        self.check_rois(rois)
+
+        def extract(roi):
+            (bx, by, bz), (rx, ry, rz) = roi
+            save_path = path.join(self.save_path, PackSlicer.roi_name(*roi))
+            if not path.isdir(save_path):
+                makedirs(save_path)
+            domain = self.all_data[bx:bx + rx, by:by + ry, bz:bz + rz]
+            with tracer.span('pack_slicer.roi', items = rx*ry*rz):
+                if slice == 'plane':
+                    self.plane_slice(direction = direction, incremental = incremental, domain = domain,
+                                        save_path = save_path, **slice_args)
+                elif slice == 'volume':
+                    self.volume_slice(num_slice = num_slice, incremental = incremental, domain = domain,
+                                        save_path = save_path, **slice_args)
+            return save_path
+
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            out_dirs = list(executor.map(extract, rois))
+        return {PackSlicer.roi_name(*roi): out_dir for roi, out_dir in zip(rois, out_dirs)}
+
+    def measures(self, dimension = 'voxel', chunk = 64, workers = None):
+        """
+        porosity profiles along x, y and z, specific surface and Euler characteristic
+            of the void space, computed in one streaming pass over slabs of the
+            trimmed domain (or of all data if trim_data was not called)
+        """
+        voxel_size = {'voxel':1, 'real': self.voxel_size}[dimension]
+        volume = getattr(self, 'domain', self.all_data)
+        return volume_measures(volume, void = 0, voxel_size = voxel_size, chunk = chunk, workers = workers)
+
+    def build_pyramid(self, factors = (2, 4, 8), chunk = 64, save = True):
+        """
+        coarse levels of all data for previews, porosity estimates and ROI selection;
+            saved next to the pack file and reloaded by later runs
+        """
+        pyramid_file = VoxelPyramid.file_name(self.data_file)
+        if path.isfile(pyramid_file) and path.getmtime(pyramid_file) >= path.getmtime(self.data_file):
+            self.pyramid = VoxelPyramid.load(pyramid_file)
+            if set(factors) <= set(self.pyramid.factors):
+                return self.pyramid
+        self.pyramid = VoxelPyramid.from_volume(self.all_data, factors = factors, chunk = chunk)
+        if save:
+            self.pyramid.save(pyramid_file)
+        return self.pyramid
+
     def __call__(self, slice = 'plane', domain_begin = None, domain_range = None,
      direction = None, num_slice = None):
 
@@ -155,6 +308,8 @@ if __name__ == '__main__':
     parser.add_argument('--direction', nargs = '?', type=str, help='direction of plane slicing')
     parser.add_argument('--num_slice', nargs = '?', type=int, default = 4,  help='number of volumetric or plane slice')
     parser.add_argument('--domain', nargs = '*', default = 'none')
+    parser.add_argument('--compact', action = 'store_true', help='hold the pack run length encoded')
+    parser.add_argument('--mmap', action = 'store_true', help='memory map a cached .npy copy of the pack')
 
     args = vars(parser.parse_args())
     if args['filename'][-4:] == '.ini':
@@ -0,0 +1,139 @@
+# ################################## #
+#   Multi resolution voxel pyramid   #
+# ################################## #
+
+import numpy as np
+from os import path
+
+class VoxelPyramid:
+    """
+    downsampled copies of a binary volume (1 = solid) at factors 2, 4, 8, ...
+        every level stores the solid fraction of its blocks; majority pooling
+        is derived from the fraction on access
+    => built in one pass over slabs of the volume, so memory maps work
+    => saved as <name>_pyramid.npz next to the binary volume
+    """
+    def __init__(self, shape, levels):
+        self.shape = tuple(shape)
+        self.levels = levels
+
+    @property
+    def factors(self):
+        return sorted(self.levels.keys())
+
+    @staticmethod
+    def _block_sum(array, factor):
+        for axis in range(array.ndim):
+            array = np.add.reduceat(array, np.arange(0, array.shape[axis], factor), axis = axis)
+        return array
+
+    def block_sizes(self, factor):
+        """
+        number of voxels in every block of a level; blocks at the far faces may be partial
+        """
+        lengths = [np.diff(np.append(np.arange(0, n, factor), n)) for n in self.shape]
+        return lengths[0][:, None, None]*lengths[1][None, :, None]*lengths[2][None, None, :]
+
+    @classmethod
+    def from_volume(cls, volume, factors = (2, 4, 8), chunk = 64):
+        """
+        volume: any array like with x slicing (ndarray, memory map, compact volume)
+        chunk: planes per slab; rounded up to a multiple of every factor
+        """
+        factors = sorted(factors)
+        align = int(np.lcm.reduce(factors))
+        step = -(-chunk//align)*align
+        nx, ny, nz = volume.shape
+        levels = {factor: np.empty((-(-nx//factor), -(-ny//factor), -(-nz//factor)), dtype = np.float32) for factor in factors}
+        for begin in range(0, nx, step):
+            slab = (np.asarray(volume[begin:begin + step]) == 1).astype(np.int32)
+            for factor in factors:
+                levels[factor][begin//factor:begin//factor + -(-slab.shape[0]//factor)] = VoxelPyramid._block_sum(slab, factor)
+        pyramid = cls((nx, ny, nz), levels)
+        for factor in factors:
+            levels[factor] /= pyramid.block_sizes(factor)
+        return pyramid
+
+    # ### storage ### #
+    @staticmethod
+    def file_name(volume_file):
+        return path.splitext(volume_file)[0] + '_pyramid.npz'
+
+    def save(self, file_name):
+        np.savez_compressed(file_name, shape = np.array(self.shape),
+                                **{'level_' + str(factor): level for factor, level in self.levels.items()})
+        return file_name
+
+    @classmethod
+    def load(cls, file_name):
+        with np.load(file_name) as stored:
+            levels = {int(key.split('_')[1]): stored[key] for key in stored.files if key.startswith('level_')}
+            return cls(tuple(stored['shape']), levels)
+
+    # ### coarse queries ### #
+    def level(self, factor, pooling = 'fraction'):
+        """
+        pooling: fraction (solid fraction per block) or majority (1 where solid dominates)
+        """
+        if factor == 1:
+            raise KeyError('level 1 is the full resolution volume')
+        return {'fraction': lambda level: level,
+                    'majority': lambda level: (level >= 0.5).astype(np.int8)}[pooling](self.levels[factor])
+
+    def porosity(self, factor = None):
+        """
+        void fraction estimated on a level; None uses the coarsest level
+        """
+        factor = factor or self.factors[-1]
+        sizes = self.block_sizes(factor)
+        return 1 - float((self.levels[factor]*sizes).sum()/sizes.sum())
+
+    def select_level(self, max_points, phase = 1):
+        """
+        smallest factor whose number of phase blocks (majority pooling) is at most max_points
+        """
+        for factor in self.factors:
+            if np.count_nonzero(self.level(factor, 'majority') == phase) <= max_points:
+                return factor
+        return self.factors[-1]
+
+    def points(self, factor, phase = 1):
+        """
+        full resolution coordinates of the block centers of phase at a level
+        """
+        index = np.nonzero(self.level(factor, 'majority') == phase)
+        return tuple(np.minimum(ind*factor + 0.5*(factor - 1), n - 1) for ind, n in zip(index, self.shape))
+
+    def roi_porosity(self, begin, extent, factor = None):
+        """
+        void fraction of a region of interest given in full resolution voxels
+        """
+        factor = factor or self.factors[-1]
+        coarse = tuple(slice(b//factor, -(-(b + e)//factor)) for b, e in zip(begin, extent))
+        sizes = self.block_sizes(factor)[coarse]
+        return 1 - float((self.levels[factor][coarse]*sizes).sum()/sizes.sum())
+
+    def find_roi(self, extent, porosity, factor = None):
+        """
+        full resolution begin of the block aligned region of size extent whose coarse
+            porosity is closest to porosity; used to pick sub-domains before trimming
+            only regions inside the volume (begin + extent <= shape) are considered
+        """
+        if any(e > n for e, n in zip(extent, self.shape)):
+            raise ValueError('extent ' + str(tuple(extent)) + ' does not fit in the volume ' + str(self.shape))
+        factor = factor or self.factors[-1]
+        blocks = [max(1, e//factor) for e in extent]
+        solid = self.levels[factor]*self.block_sizes(factor)
+        sizes = self.block_sizes(factor).astype(float)
+        # summed volume tables give every window sum in one vectorized step
+        windows = []
+        for table in (solid, sizes):
+            table = np.pad(table, ((1, 0), (1, 0), (1, 0))).cumsum(0).cumsum(1).cumsum(2)
+            bx, by, bz = blocks
+            windows.append(table[bx:, by:, bz:] - table[:-bx, by:, bz:] - table[bx:, :-by, bz:] - table[bx:, by:, :-bz]
+                            + table[:-bx, :-by, bz:] + table[:-bx, by:, :-bz] + table[bx:, :-by, :-bz] - table[:-bx, :-by, :-bz])
+        error = np.abs(1 - windows[0]/windows[1] - porosity)
+        inside = [np.arange(size)*factor + e <= n for size, e, n in zip(error.shape, extent, self.shape)]
+        error[~(inside[0][:, None, None] & inside[1][None, :, None] & inside[2][None, None, :])] = np.inf
+        best = np.unravel_index(np.argmin(error), error.shape)
+        return tuple(int(ind)*factor for ind in best)
@@ -0,0 +1,152 @@
+# ########################################## #
+#   Run length encoded binary voxel volumes  #
+# ########################################## #
+
+import numpy as np
+from itertools import islice
+
+class RunLengthVolume:
+    """
+    binary volume stored as runs of ones along z in every (x, y) row
+        row r = x*ny + y owns starts[row_ptr[r]:row_ptr[r + 1]] and the
+        matching ends (exclusive); everything outside a run is zero
+    => x/y/z slicing returns a cropped RunLengthVolume without decoding
+    => np.asarray(volume[a:b]) decodes a slab, so slab based code
+        (measures, pyramid) runs unchanged on it
+    """
+    def __init__(self, shape, row_ptr, starts, ends, dtype = int):
+        self.shape = tuple(int(n) for n in shape)
+        self.row_ptr = row_ptr
+        self.starts = starts
+        self.ends = ends
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def ndim(self):
+        return 3
+
+    @property
+    def size(self):
+        return self.shape[0]*self.shape[1]*self.shape[2]
+
+    @property
+    def nbytes(self):
+        return self.row_ptr.nbytes + self.starts.nbytes + self.ends.nbytes
+
+    # ### conversion ### #
+    @staticmethod
+    def _encode(slab):
+        """
+        runs of ones along the last axis of a 3d slab; rows are numbered within the slab
+        """
+        rows = slab.reshape(-1, slab.shape[-1]) == 1
+        steps = np.diff(np.pad(rows.astype(np.int8), ((0, 0), (1, 1))), axis = 1)
+        run_rows, starts = np.nonzero(steps == 1)
+        _, ends = np.nonzero(steps == -1)
+        return np.bincount(run_rows, minlength = rows.shape[0]), starts.astype(np.int32), ends.astype(np.int32)
+
+    @classmethod
+    def _from_slabs(cls, slabs, shape, dtype = int):
+        counts, starts, ends = [], [], []
+        for slab in slabs:
+            slab_counts, slab_starts, slab_ends = RunLengthVolume._encode(slab)
+            counts.append(slab_counts)
+            starts.append(slab_starts)
+            ends.append(slab_ends)
+        row_ptr = np.zeros(shape[0]*shape[1] + 1, dtype = np.int64)
+        np.cumsum(np.concatenate(counts), out = row_ptr[1:])
+        return cls(shape, row_ptr, np.concatenate(starts), np.concatenate(ends), dtype = dtype)
+
+    @classmethod
+    def from_dense(cls, volume, chunk = 64):
+        """
+        volume: any array like with x slicing; encoded one slab of chunk x planes at a time
+        """
+        nx = volume.shape[0]
+        slabs = (np.asarray(volume[begin:begin + chunk]) for begin in range(0, nx, chunk))
+        return cls._from_slabs(slabs, volume.shape, dtype = getattr(volume, 'dtype', int))
+
+    @classmethod
+    def from_text(cls, file_name, shape, skiprows = 2, chunk = 16):
+        """
+        pack file with one voxel per line (Lattice/LubaStilin output) read chunk x planes
+            at a time, so the dense int array of np.loadtxt is never held in memory
+        """
+        nx, ny, nz = shape
+        def slabs(in_file):
+            for begin in range(0, nx, chunk):
+                planes = min(chunk, nx - begin)
+                yield np.loadtxt(islice(in_file, planes*ny*nz), dtype = np.int8, ndmin = 1).reshape(planes, ny, nz)
+        with open(file_name) as in_file:
+            for _ in range(skiprows):
+                next(in_file)
+            return cls._from_slabs(slabs(in_file), shape)
+
+    def to_dense(self, dtype = None):
+        nx, ny, nz = self.shape
+        run_rows = np.repeat(np.arange(nx*ny), np.diff(self.row_ptr))
+        # +1 at every run start and -1 at every run end, summed along z; runs never touch
+        steps = np.zeros((nx*ny, nz + 1), dtype = np.int8)
+        steps[run_rows, self.starts] = 1
+        steps[run_rows, self.ends] = -1
+        return np.cumsum(steps[:, :-1], axis = 1, dtype = np.int8).astype(dtype or self.dtype, copy = False).reshape(nx, ny, nz)
+
+    def __array__(self, dtype = None, copy = None):
+        return self.to_dense(dtype)
+
+    # ### slicing ### #
+    @staticmethod
+    def _bounds(key, length):
+        if isinstance(key, slice):
+            begin, end, step = key.indices(length)
+            if step != 1:
+                raise IndexError('only unit step slices are supported')
+            return begin, max(begin, end)
+        raise IndexError('only slices are supported; use np.asarray for point indexing')
+
+    def __getitem__(self, key):
+        key = key if isinstance(key, tuple) else (key,)
+        key = key + (slice(None),)*(3 - len(key))
+        (x0, x1), (y0, y1), (z0, z1) = [RunLengthVolume._bounds(k, n) for k, n in zip(key, self.shape)]
+        rows = (np.arange(x0, x1)[:, None]*self.shape[1] + np.arange(y0, y1)[None, :]).ravel()
+        counts = self.row_ptr[rows + 1] - self.row_ptr[rows]
+        # index of every run of the selected rows, gathered without a python loop
+        first = np.repeat(self.row_ptr[rows] - np.cumsum(counts) + counts, counts)
+        index = first + np.arange(first.size)
+        new_rows = np.repeat(np.arange(rows.size), counts)
+        starts = np.maximum(self.starts[index], z0)
+        ends = np.minimum(self.ends[index], z1)
+        keep = starts < ends
+        row_ptr = np.zeros(rows.size + 1, dtype = np.int64)
+        np.cumsum(np.bincount(new_rows[keep], minlength = rows.size), out = row_ptr[1:])
+        return RunLengthVolume((x1 - x0, y1 - y0, z1 - z0), row_ptr, (starts[keep] - z0).astype(np.int32),
+                                (ends[keep] - z0).astype(np.int32), dtype = self.dtype)
+
+    # ### coordinates from runs ### #
+    def runs(self, value = 1):
+        """
+        (rows, starts, ends) of the runs of value; runs of zero are the gaps between runs of one
+        """
+        counts = np.diff(self.row_ptr)
+        if value == 1:
+            return np.repeat(np.arange(counts.size), counts), self.starts, self.ends
+        starts = np.insert(self.ends, self.row_ptr[:-1], 0)
+        ends = np.insert(self.starts, self.row_ptr[1:], self.shape[2])
+        rows = np.repeat(np.arange(counts.size), counts + 1)
+        keep = starts < ends
+        return rows[keep], starts[keep], ends[keep]
+
+    def count(self, value = 1):
+        ones = int((self.ends - self.starts).sum())
+        return ones if value == 1 else self.size - ones
+
+    def coordinates(self, value = 1):
+        """
+        x, y, z indices of the voxels equal to value in the order of np.where
+        """
+        rows, starts, ends = self.runs(value)
+        lengths = ends - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        z = offsets + np.arange(offsets.size)
+        rows = np.repeat(rows, lengths)
+        return rows//self.shape[1], rows%self.shape[1], z
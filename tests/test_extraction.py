@@ -0,0 +1,39 @@
+import numpy as np
+from ..analytics.extraction import PoreExtractor
+
+def two_rooms():
+    """
+    two void rooms split by a solid wall holding a thin void pocket without a seed
+    """
+    plane = np.ones((20, 31), dtype = int)
+    plane[2:18, 2:12] = 0
+    plane[2:18, 19:29] = 0
+    plane[9:11, 13:18] = 0
+    return plane
+
+def test_pores_do_not_connect_across_solid():
+    plane = two_rooms()
+    pores, _, connections, throats = PoreExtractor.extract_plane(plane, min_radius = 2)
+    assert len(pores) == 2
+    assert connections.sum() == 0
+    assert len(throats) == 0
+
+def test_seedless_component_stays_unlabeled():
+    plane = two_rooms()
+    seeds = np.array([[9, 6], [9, 23]])
+    labels = PoreExtractor._assign_pores(plane == 0, seeds)
+    assert (labels[9:11, 13:18] == 0).all()
+    assert set(np.unique(labels[2:18, 2:12])) == {1}
+    assert set(np.unique(labels[2:18, 19:29])) == {2}
+
+def test_empty_planes_round_trip(tmp_path):
+    from ..analytics.classification import PoreNetwork2D
+    domain = np.ones((20, 31, 3), dtype = int)
+    domain[..., 0] = two_rooms()
+    domain[9:11, 3:5, 2] = 0
+    extractor = PoreExtractor(domain, min_radius = 1)(workers = 1)
+    extractor.to_files(str(tmp_path))
+    network = PoreNetwork2D(file_path = str(tmp_path), plane_area = 20*31)
+    assert [len(pores) for pores in network.pores] == [len(pores) for pores in extractor.pores]
+    assert [connections.shape for connections in network.connections] == [connections.shape for connections in extractor.connections]
+    assert network.statistics(workers = 1).equals(extractor.to_network().statistics(workers = 1))
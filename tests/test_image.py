@@ -0,0 +1,13 @@
+from os import path
+from ..preprocess.image import ImageReader
+from ..benchmarks import synthetic
+
+def test_default_save_dir_is_stable_across_runs(tmp_path):
+    synthetic.write_tiff_stack(synthetic.random_pack(8), str(tmp_path/'stack.tif'))
+    reader = ImageReader.from_image_stack(stack_path = str(tmp_path), stack_name = 'stack.tif')
+    reader.output_2_csv()
+    save_dir = path.join(str(tmp_path), 'PoreNet_Inputs_stack_8x8x8')
+    out_name = path.join(save_dir, 'input_image_0.csv')
+    written = path.getmtime(out_name)
+    ImageReader.from_image_stack(stack_path = str(tmp_path), stack_name = 'stack.tif').output_2_csv()
+    assert path.getmtime(out_name) == written
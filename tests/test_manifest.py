@@ -0,0 +1,74 @@
+import numpy as np
+from os import path, listdir, utime
+from ..preprocess.packslicer import PackSlicer
+from ..utils.manifest import SliceManifest
+from ..benchmarks import synthetic
+
+def slicer_for(tmp_path):
+    if not path.isfile(str(tmp_path/'pack.txt')):
+        synthetic.write_pack(synthetic.random_pack(12), str(tmp_path/'pack.txt'))
+    slicer = PackSlicer(filename = 'pack.txt', filepath = str(tmp_path), voxel = 'solid')
+    slicer.trim_data()
+    return slicer
+
+def mtimes(save_path):
+    return {name: path.getmtime(path.join(save_path, name)) for name in listdir(save_path) if name.endswith('.csv')}
+
+def aged(save_path):
+    """
+    sets the slices to an old mtime, so any rewrite shows on coarse clocks
+    """
+    for name in mtimes(save_path):
+        utime(path.join(save_path, name), (1, 1))
+    return mtimes(save_path)
+
+def test_digest_depends_on_voxels_and_parameters():
+    array = np.zeros((2, 3, 4), dtype = int)
+    assert SliceManifest.digest(array, sep = ' ') == SliceManifest.digest(array.copy(), sep = ' ')
+    assert SliceManifest.digest(array, sep = ' ') != SliceManifest.digest(array, sep = ',')
+    changed = array.copy()
+    changed[1, 2, 3] = 1
+    assert SliceManifest.digest(array, sep = ' ') != SliceManifest.digest(changed, sep = ' ')
+
+def test_rerun_skips_and_one_plane_edit_regenerates(tmp_path):
+    slicer = slicer_for(tmp_path)
+    slicer.plane_slice(direction = 'x')
+    before = aged(slicer.save_path)
+    slicer.plane_slice(direction = 'x')
+    assert mtimes(slicer.save_path) == before
+
+    before = aged(slicer.save_path)
+    slicer.all_data[3] = 1 - slicer.all_data[3]
+    slicer.trim_data()
+    slicer.plane_slice(direction = 'x')
+    after = mtimes(slicer.save_path)
+    assert [name for name in before if after.get(name) != before[name]] == ['Slice_in_x_3.csv']
+
+def test_full_run_rewrites_every_slice(tmp_path):
+    slicer = slicer_for(tmp_path)
+    slicer.plane_slice(direction = 'x')
+    before = aged(slicer.save_path)
+    slicer.plane_slice(direction = 'x', incremental = False)
+    after = mtimes(slicer.save_path)
+    assert all(after[name] != before[name] for name in before)
+
+def test_shrinking_domain_prunes_old_slices(tmp_path):
+    slicer = slicer_for(tmp_path)
+    slicer.plane_slice(direction = 'x')
+    slicer.trim_data((0, 0, 0), (6, 12, 12))
+    slicer.plane_slice(direction = 'x')
+    names = sorted(mtimes(slicer.save_path))
+    assert names == ['Slice_in_x_' + str(count) + '.csv' for count in range(5)]
+    manifest = SliceManifest(slicer.save_path)
+    assert sorted(manifest.entries) == names
+
+def test_interrupted_run_resumes_from_flushed_entries(tmp_path):
+    slicer = slicer_for(tmp_path)
+    slicer.plane_slice(direction = 'x')
+    manifest = SliceManifest(slicer.save_path)
+    del manifest.entries['Slice_in_x_0.csv']
+    manifest.flush()
+    before = aged(slicer.save_path)
+    slicer.plane_slice(direction = 'x')
+    after = mtimes(slicer.save_path)
+    assert [name for name in before if after[name] != before[name]] == ['Slice_in_x_0.csv']
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from ..preprocess.measures import volume_measures
+from ..benchmarks import synthetic
+
+def embed(void):
+    """
+    void mask (True = void) inside a solid volume with a two voxel margin
+    """
+    volume = np.ones(tuple(n + 4 for n in void.shape), dtype = int)
+    volume[2:-2, 2:-2, 2:-2][void] = 0
+    return volume
+
+def test_single_void_voxel():
+    assert volume_measures(embed(np.ones((1, 1, 1), dtype = bool)), workers = 1).euler_characteristic == 1
+
+def test_ring():
+    ring = np.zeros((5, 5, 1), dtype = bool)
+    ring[[0, -1], :, 0] = True
+    ring[:, [0, -1], 0] = True
+    assert volume_measures(embed(ring), workers = 1).euler_characteristic == 0
+
+def test_shell():
+    shell = np.ones((3, 3, 3), dtype = bool)
+    shell[1, 1, 1] = False
+    assert volume_measures(embed(shell), workers = 1).euler_characteristic == 2
+
+@pytest.mark.parametrize('chunk', [1, 2, 5, 64])
+def test_chunk_invariance(chunk):
+    volume = synthetic.random_pack(24)
+    reference = volume_measures(volume, chunk = 64, workers = 1)
+    measures = volume_measures(volume, chunk = chunk, workers = 1)
+    assert measures.euler_characteristic == reference.euler_characteristic
+    assert measures.specific_surface == pytest.approx(reference.specific_surface)
+    assert np.allclose(measures.porosity_x, reference.porosity_x)
+    assert measures.porosity == pytest.approx(1 - volume.mean())
+
+def test_process_pool_matches_single_process():
+    volume = synthetic.random_pack(24)
+    pooled, single = volume_measures(volume, chunk = 5, workers = 2), volume_measures(volume, chunk = 5, workers = 1)
+    assert all(np.array_equal(a, b) for a, b in zip(pooled, single))
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+from ..preprocess.packslicer import PackSlicer
+from ..benchmarks import synthetic
+
+@pytest.fixture
+def slicer(tmp_path):
+    synthetic.write_pack(synthetic.random_pack(20), str(tmp_path/'pack.txt'))
+    return PackSlicer(filename = 'pack.txt', filepath = str(tmp_path), voxel = 'solid')
+
+@pytest.mark.parametrize('rois', [[((15, 15, 15), (10, 10, 10))],
+                                    [((-2, 0, 0), (5, 5, 5))],
+                                    [((0, 0, 0), (0, 5, 5))],
+                                    [((0, 0, 0), (5, 5, 5)), ((0, 0, 0), (5, 5, 5))]])
+def test_extract_rois_rejects_invalid_rois(slicer, rois):
+    with pytest.raises(ValueError):
+        slicer.extract_rois(rois, workers = 2)
+
+def test_extract_rois_writes_every_roi(slicer):
+    rois = [((0, 0, 0), (5, 5, 5)), ((10, 10, 10), (10, 10, 10))]
+    out_dirs = slicer.extract_rois(rois, workers = 2)
+    assert sorted(out_dirs) == ['ROI_0_0_0_5_5_5', 'ROI_10_10_10_10_10_10']
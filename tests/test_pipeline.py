@@ -0,0 +1,14 @@
+from os import path
+from ..pipeline import run_image_stack
+from ..analytics.classification import PoreNetwork2D
+from ..benchmarks import synthetic
+
+def test_network_reloads_after_rendering(tmp_path):
+    synthetic.write_tiff_stack(synthetic.random_pack(16), str(tmp_path/'stack.tif'))
+    save_dir = str(tmp_path/'network')
+    network = run_image_stack(str(tmp_path), 'stack.tif', save_dir = save_dir, write_network = True,
+                                workers = {'analyze': 1})
+    assert path.dirname(network.save_dir) == save_dir
+    network.render_planes(planes = [0], workers = 1)
+    reloaded = PoreNetwork2D(file_path = save_dir)
+    assert [len(pores) for pores in reloaded.pores] == [len(pores) for pores in network.pores]
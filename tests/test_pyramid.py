@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from ..preprocess.pyramid import VoxelPyramid
+
+@pytest.fixture
+def volume():
+    return (np.random.default_rng(0).random((37, 20, 13)) < 0.4).astype(int)
+
+def block_mean(volume, factor):
+    nx, ny, nz = [-(-n//factor) for n in volume.shape]
+    out = np.empty((nx, ny, nz))
+    for i in range(nx):
+        for j in range(ny):
+            for k in range(nz):
+                out[i, j, k] = volume[i*factor:(i + 1)*factor, j*factor:(j + 1)*factor, k*factor:(k + 1)*factor].mean()
+    return out
+
+@pytest.mark.parametrize('chunk', [1, 5, 64])
+def test_fraction_levels_match_block_means(volume, chunk):
+    pyramid = VoxelPyramid.from_volume(volume, factors = (2, 3, 8), chunk = chunk)
+    for factor in pyramid.factors:
+        assert np.allclose(pyramid.level(factor), block_mean(volume, factor))
+
+def test_majority_pooling_and_porosity(volume):
+    pyramid = VoxelPyramid.from_volume(volume)
+    assert np.array_equal(pyramid.level(4, 'majority'), (block_mean(volume, 4) >= 0.5).astype(np.int8))
+    for factor in pyramid.factors:
+        assert pyramid.porosity(factor) == pytest.approx(1 - volume.mean())
+    assert pyramid.roi_porosity((8, 0, 0), (16, 16, 8), 8) == pytest.approx(1 - volume[8:24, :16, :8].mean())
+
+def test_save_and_load(volume, tmp_path):
+    pyramid = VoxelPyramid.from_volume(volume)
+    loaded = VoxelPyramid.load(pyramid.save(VoxelPyramid.file_name(str(tmp_path/'pack.txt'))))
+    assert loaded.shape == volume.shape and loaded.factors == pyramid.factors
+    assert all(np.array_equal(loaded.levels[factor], pyramid.levels[factor]) for factor in pyramid.factors)
+
+def test_select_level_bounds_points(volume):
+    pyramid = VoxelPyramid.from_volume(volume)
+    factor = pyramid.select_level(100, phase = 0)
+    assert len(pyramid.points(factor, phase = 0)[0]) <= 100 or factor == pyramid.factors[-1]
+
+def test_find_roi_stays_inside(volume):
+    pyramid = VoxelPyramid.from_volume(volume)
+    for extent in [(16, 16, 8), (37, 20, 13), (5, 19, 3)]:
+        begin = pyramid.find_roi(extent, 0.6)
+        assert all(b + e <= n for b, e, n in zip(begin, extent, volume.shape))
+    with pytest.raises(ValueError):
+        pyramid.find_roi((16, 24, 8), 0.6)
@@ -0,0 +1,23 @@
+import numpy as np
+from os import path
+from ..analytics.extraction import PoreExtractor
+
+def test_render_planes_writes_empty_planes(tmp_path):
+    domain = np.ones((12, 12, 3), dtype = int)
+    domain[3:9, 3:9, 0] = 0
+    domain[2:10, 4:8, 2] = 0
+    network = PoreExtractor(domain)(workers = 1).to_network(file_path = str(tmp_path))
+    assert [len(pores) for pores in network.pores] == [1, 0, 1]
+    out_files = network.render_planes(workers = 1)
+    assert len(out_files) == 9
+    assert all(path.isfile(out_name) for out_name in out_files)
+
+def test_render_names_do_not_match_network_files(tmp_path):
+    from ..utils.tools import list_files
+    domain = np.ones((12, 12, 2), dtype = int)
+    domain[3:9, 3:9, :] = 0
+    extractor = PoreExtractor(domain)(workers = 1)
+    extractor.to_files(str(tmp_path))
+    extractor.to_network(file_path = str(tmp_path)).render_planes(workers = 1)
+    for file_name in ('pores', 'maxball', 'connections'):
+        assert len(list_files(str(tmp_path), file_name)) == 2
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+from ..preprocess.sparse import RunLengthVolume
+from ..benchmarks import synthetic
+
+def random_volume(rng):
+    shape = tuple(rng.integers(1, 15, 3))
+    return (rng.random(shape) < rng.random()).astype(int)
+
+def random_slices(rng, shape):
+    bounds = [np.sort(rng.integers(0, n + 1, 2)) for n in shape]
+    return tuple(slice(int(begin), int(end)) for begin, end in bounds)
+
+@pytest.mark.parametrize('seed', range(20))
+def test_slices_and_coordinates_match_dense(seed):
+    rng = np.random.default_rng(seed)
+    volume = random_volume(rng)
+    encoded = RunLengthVolume.from_dense(volume, chunk = int(rng.integers(1, 6)))
+    assert np.array_equal(np.asarray(encoded), volume)
+    for key in [random_slices(rng, volume.shape) for _ in range(5)] + [(slice(None),)]:
+        cropped = encoded[key]
+        assert cropped.shape == volume[key].shape
+        assert np.array_equal(np.asarray(cropped), volume[key])
+        for value in (0, 1):
+            assert all(np.array_equal(a, b) for a, b in zip(cropped.coordinates(value), np.where(volume[key] == value)))
+            assert cropped.count(value) == np.count_nonzero(volume[key] == value)
+
+def test_from_text_matches_loadtxt(tmp_path):
+    volume = synthetic.random_pack(10)
+    synthetic.write_pack(volume, str(tmp_path/'pack.txt'))
+    encoded = RunLengthVolume.from_text(str(tmp_path/'pack.txt'), volume.shape, chunk = 3)
+    assert np.array_equal(np.asarray(encoded), volume)
+    assert encoded.nbytes < volume.nbytes
+
+def test_point_and_step_indexing_are_rejected():
+    encoded = RunLengthVolume.from_dense(np.ones((2, 2, 2), dtype = int))
+    with pytest.raises(IndexError):
+        encoded[0]
+    with pytest.raises(IndexError):
+        encoded[::2]
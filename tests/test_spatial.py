@@ -0,0 +1,12 @@
+import numpy as np
+from ..analytics.spatial import PlaneIndex
+
+def test_match_links_overlapping_circle_behind_nearest_center():
+    index = PlaneIndex(np.array([0., 10.]), np.array([0., 0.]), np.array([1., 9.]))
+    other = PlaneIndex(np.array([3.]), np.array([0.]), np.array([0.5]))
+    assert index.match(other).tolist() == [[1, 0]]
+
+def test_match_is_one_to_one():
+    index = PlaneIndex(np.array([0., 4.]), np.array([0., 0.]), np.array([3., 3.]))
+    other = PlaneIndex(np.array([1., 2.]), np.array([0., 0.]), np.array([1., 1.]))
+    assert index.match(other).tolist() == [[0, 0], [1, 1]]
@@ -0,0 +1,23 @@
+import numpy as np
+from ..analytics.statistics import connected_groups, NetworkStatistics
+from ..analytics.extraction import PoreExtractor
+
+def test_self_connection_is_not_a_group():
+    connections = np.array([[1, 0, 0], [0, 0, 1], [0, 1, 0]])
+    assert [group.tolist() for group in connected_groups(connections)] == [[1, 2]]
+
+def test_empty_plane_has_zero_porosity():
+    domain = np.ones((12, 12, 3), dtype = int)
+    domain[3:9, 3:9, 0] = 0
+    domain[3:9, 3:9, 2] = 0
+    network = PoreExtractor(domain)(workers = 1).to_network()
+    porosity = NetworkStatistics(network).porosity()['porosity']
+    assert porosity[1] == 0
+    assert np.isfinite(porosity).all()
+
+def test_estimated_area_without_domain():
+    domain = np.ones((12, 12, 2), dtype = int)
+    domain[3:9, 3:9, 0] = 0
+    network = PoreExtractor(domain)(workers = 1).to_network()
+    network.plane_area = None
+    assert NetworkStatistics(network).porosity()['porosity'].tolist()[1] == 0
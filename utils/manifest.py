@@ -0,0 +1,90 @@
+# ########################################## #
+#   Content addressed manifest of outputs    #
+# ########################################## #
+
+import numpy as np
+import json
+import hashlib
+from os import path, replace, remove
+
+class SliceManifest:
+    """
+    json file in a save directory mapping every output file to a hash of
+        its source voxels and slicing parameters
+    => outputs whose hash did not change and whose file still exists are skipped
+    => the manifest is flushed every flush_every records, so an interrupted
+        run resumes from the last flushed slice
+    """
+    FILE_NAME = 'slice_manifest.json'
+
+    def __init__(self, save_dir, flush_every = 50):
+        self.file_name = path.join(save_dir, SliceManifest.FILE_NAME)
+        self.flush_every = flush_every
+        self.entries = {}
+        self.produced = set()
+        self._pending = 0
+        if path.isfile(self.file_name):
+            try:
+                with open(self.file_name) as manifest_file:
+                    self.entries = json.load(manifest_file)
+            except ValueError:
+                self.entries = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+        return False
+
+    @staticmethod
+    def digest(array, **params):
+        """
+        hash of the voxels, their shape and the parameters of the output
+        """
+        array = np.ascontiguousarray(array)
+        digest = hashlib.blake2b(digest_size = 16)
+        digest.update(json.dumps({'shape': array.shape, 'dtype': str(array.dtype), **params}, sort_keys = True, default = str).encode())
+        digest.update(array.reshape(-1).view(np.uint8))
+        return digest.hexdigest()
+
+    def is_current(self, out_name, digest):
+        """
+        out_name is up to date; empty slices are recorded without a file
+        """
+        self.produced.add(path.basename(out_name))
+        entry = self.entries.get(path.basename(out_name))
+        if entry is None or entry['digest'] != digest:
+            return False
+        if entry['size'] is None:
+            return True
+        return path.isfile(out_name) and path.getsize(out_name) == entry['size']
+
+    def record(self, out_name, digest):
+        """
+        records out_name after it was written; a missing file marks an empty slice
+        """
+        self.produced.add(path.basename(out_name))
+        self.entries[path.basename(out_name)] = {'digest': digest,
+                                                    'size': path.getsize(out_name) if path.isfile(out_name) else None}
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        temp_name = self.file_name + '.tmp'
+        with open(temp_name, 'w') as manifest_file:
+            json.dump(self.entries, manifest_file, indent = 1)
+        replace(temp_name, self.file_name)
+        self._pending = 0
+
+    def prune(self, prefix = ''):
+        """
+        removes outputs starting with prefix that earlier runs wrote and this run did not produce
+        """
+        save_dir = path.dirname(self.file_name)
+        for name in [name for name in self.entries if name.startswith(prefix) and name not in self.produced]:
+            if path.isfile(path.join(save_dir, name)):
+                remove(path.join(save_dir, name))
+            del self.entries[name]
+        self.flush()
@@ -1,14 +1,65 @@
 
 import numpy as np 
-from os import listdir
-from natsort import natsorted
+from os import listdir, cpu_count
+from collections import deque
+from itertools import islice
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
 
 # ##### useful functions ##### #
-list_files = lambda file_path, file_name: natsorted([_file for _file in listdir(file_path) if file_name in _file], key= lambda y: y.lower())
+def list_files(file_path, file_name):
+    from natsort import natsorted
+    return natsorted([_file for _file in listdir(file_path) if file_name in _file], key= lambda y: y.lower())
 
-def generate_RGB(number):
-    return [((1/255)*np.random.randint(0, 255), (1/255)*np.random.randint(0, 255), 
-                (1/255)*np.random.randint(0, 255)) for num in range(number)]
+def generate_RGB(number, seed = None):
+    """
+    seed: None (global numpy state), an int or a RandomState
+        pass a seed to get the same colors in every process
+    """
+    rng = np.random if seed is None else (seed if isinstance(seed, np.random.RandomState) else np.random.RandomState(seed))
+    return [((1/255)*rng.randint(0, 255), (1/255)*rng.randint(0, 255), 
+                (1/255)*rng.randint(0, 255)) for num in range(number)]
+
+def bounded_map(executor, func, iterable, max_pending):
+    """
+    ordered executor.map that keeps at most max_pending tasks in flight;
+        the iterable is consumed lazily so chunks are not all materialized
+    """
+    pending = deque()
+    for item in iterable:
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+        pending.append(executor.submit(func, item))
+    while pending:
+        yield pending.popleft().result()
+
+def _map_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+def _chunks(iterable, chunksize):
+    iterator = iter(iterable)
+    chunk = list(islice(iterator, chunksize))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, chunksize))
+
+def process_map(func, iterable, workers = None, chunksize = 1, initializer = None, initargs = ()):
+    """
+    ordered and lazy map of func over iterable in a process pool
+        workers: number of processes; None uses all cores, 1 runs in this process
+        chunksize: items sent to a process per task
+        initializer: called with initargs once in every process (once here for workers = 1)
+    => at most 2*workers tasks are in flight, see bounded_map
+    """
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        yield from map(func, iterable)
+        return
+    workers = workers or cpu_count()
+    with ProcessPoolExecutor(max_workers = workers, initializer = initializer, initargs = initargs) as executor:
+        for chunk in bounded_map(executor, partial(_map_chunk, func), _chunks(iterable, chunksize), 2*workers):
+            yield from chunk
 
 # #### usefule containers #### #
 class GroupDict(dict):
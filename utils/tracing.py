@@ -0,0 +1,153 @@
+# ######################################## #
+#   Lightweight stage profiling and traces #
+# ######################################## #
+
+import json
+import csv
+import resource
+import threading
+from os import getpid, path, stat, environ
+from time import perf_counter
+
+class _NullSpan:
+    """
+    shared span used while tracing is disabled; every call is a no-op
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def add(self, **counters):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class Span:
+    def __init__(self, tracer, name, counters):
+        self.tracer = tracer
+        self.name = name
+        self.counters = dict(counters)
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.end = perf_counter()
+        if self.tracer.memory:
+            self.counters['max_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss/1024
+        self.tracer._record(self)
+        return False
+
+    def add(self, **counters):
+        """
+        adds to the counters of the span, e.g. bytes_read, bytes_written, items
+        """
+        for key, val in counters.items():
+            self.counters[key] = self.counters.get(key, 0) + val
+
+class Tracer:
+    """
+    collects named spans with timings and counters
+        => disabled by default; tracer.span returns a shared no-op span so
+            instrumented code costs one attribute check per span
+        => enable with tracer.enable() or the PORE_TRACE environment variable
+        => counters that cost I/O (file sizes, file lists) are added under
+            `if tracer.enabled:` so they are skipped while tracing is off
+    """
+    COUNTERS = ['bytes_read', 'bytes_written', 'items']
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.spans = []
+        self._origin = perf_counter()
+        self._lock = threading.Lock()
+
+    def enable(self, memory = False):
+        self.enabled = True
+        self.memory = memory
+        self.reset()
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        self.spans = []
+        self._origin = perf_counter()
+
+    def span(self, name, **counters):
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, counters)
+
+    def _record(self, span):
+        with self._lock:
+            self.spans.append((span.name, span.start - self._origin, span.end - span.start,
+                                getpid(), threading.get_ident(), span.counters))
+
+    # ### outputs ### #
+    def report(self):
+        """
+        aggregated spans: one entry per name with call count, timings and counter sums
+        """
+        summary = {}
+        for name, _, duration, _, _, counters in self.spans:
+            entry = summary.setdefault(name, {'name': name, 'count': 0, 'total_s': 0.0, 'max_s': 0.0,
+                                                **{key: 0 for key in Tracer.COUNTERS}})
+            entry['count'] += 1
+            entry['total_s'] += duration
+            entry['max_s'] = max(entry['max_s'], duration)
+            for key, val in counters.items():
+                entry[key] = max(entry.get(key, 0), val) if key == 'max_rss_mb' else entry.get(key, 0) + val
+        for entry in summary.values():
+            entry['mean_s'] = entry['total_s']/entry['count']
+            if entry['total_s'] > 0:
+                entry['items_per_s'] = entry['items']/entry['total_s']
+        return sorted(summary.values(), key = lambda entry: -entry['total_s'])
+
+    def write_report(self, file_name):
+        """
+        file_name: .json or .csv
+        """
+        report = self.report()
+        if file_name.endswith('.csv'):
+            columns = []
+            for entry in report:
+                columns.extend([key for key in entry.keys() if key not in columns])
+            with open(file_name, 'w', newline = '') as out_file:
+                writer = csv.DictWriter(out_file, fieldnames = columns)
+                writer.writeheader()
+                writer.writerows(report)
+        else:
+            with open(file_name, 'w') as out_file:
+                json.dump(report, out_file, indent = 2)
+        return file_name
+
+    def write_chrome_trace(self, file_name):
+        """
+        complete events in the Chrome trace format; open with chrome://tracing or Perfetto
+        """
+        events = [{'name': name, 'ph': 'X', 'ts': 1e6*start, 'dur': 1e6*duration, 'pid': pid, 'tid': tid,
+                    'args': counters} for name, start, duration, pid, tid, counters in self.spans]
+        with open(file_name, 'w') as out_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, out_file)
+        return file_name
+
+    def write_run(self, save_dir, stem = 'trace', chrome = True):
+        """
+        writes <stem>_report.json, <stem>_report.csv and optionally <stem>_chrome.json
+        """
+        out_files = [self.write_report(path.join(save_dir, stem + '_report.json')),
+                        self.write_report(path.join(save_dir, stem + '_report.csv'))]
+        if chrome:
+            out_files.append(self.write_chrome_trace(path.join(save_dir, stem + '_chrome.json')))
+        return out_files
+
+tracer = Tracer()
+if environ.get('PORE_TRACE', '') not in ('', '0'):
+    tracer.enable(memory = environ.get('PORE_TRACE') == 'memory')
+
+file_size = lambda file_name: stat(file_name).st_size if path.isfile(file_name) else 0